@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Texts the optimized transliteration is checked and timed on
+"""
+import random
+
+from core.context_processors.pytils import translit
+
+SAMPLE = (
+    u'Съешь же ещё этих мягких французских булок, да выпей чаю. '
+    u'ЩУКА, Щука и щи — «Ёлка» №5… Yo, shch & Sch; ‘quoted’ “text” '
+    u'tsch ZHzh c q y x w 0123456789 − – ‒ ts TS yi YI zh '
+)
+
+
+def random_texts(count=300, length=60, seed=0):
+    """Mixes of both alphabets, punctuation and symbols out of table"""
+    symbols = translit.ALPHABET + [u' ', u'-', u'&', u'?', u'ü', u'\n']
+    generator = random.Random(seed)
+    return [
+        u''.join(generator.choice(symbols) for _ in range(length))
+        for _ in range(count)
+    ]
+
+
+def random_latin(count=3000, length=40, seed=1):
+    """Runs of english symbols, their halves and separators"""
+    pieces = sorted(set(translit.EN_ALPHABET)) + [
+        u't', u'c', u's', u'y', u'T', u'C', u'S', u'Y', u'.', u' ', u'\n'
+    ]
+    generator = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        text = u''
+        while len(text) < length:
+            text += generator.choice(pieces)
+        texts.append(text)
+    return texts
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Reference (de)transliteration doing one str.replace per TRANSTABLE pair,
+the optimized functions must give the same output
+"""
+
+import re
+from core.context_processors.pytils.third import six
+from core.context_processors.pytils.translit import ALPHABET, TRANSTABLE
+
+
+def translify(in_string, strict=True):
+    """
+    Translify russian text
+
+    @param in_string: input string
+    @type in_string: C{unicode}
+
+    @param strict: raise error if transliteration is incomplete.
+        (True by default)
+    @type strict: C{bool}
+
+    @return: transliterated string
+    @rtype: C{str}
+
+    @raise ValueError: when string doesn't transliterate completely.
+        Raised only if strict=True
+    """
+    translit = in_string
+    for symb_in, symb_out in TRANSTABLE:
+        translit = translit.replace(symb_in, symb_out)
+
+    if strict and any(ord(symb) > 128 for symb in translit):
+        raise ValueError("Unicode string doesn't transliterate completely")
+
+    return translit
+
+
+def detranslify(in_string):
+    """
+    Detranslify
+
+    @param in_string: input string
+    @type in_string: C{basestring}
+
+    @return: detransliterated string
+    @rtype: C{unicode}
+
+    @raise ValueError: if in_string is C{str}, but it isn't ascii
+    """
+    try:
+        russian = six.text_type(in_string)
+    except UnicodeDecodeError:
+        raise ValueError("We expects if in_string is 8-bit string")
+
+    for symb_out, symb_in in TRANSTABLE:
+        russian = russian.replace(symb_in, symb_out)
+
+    # TODO: выбрать правильный регистр для ь и ъ
+    # твердый и мягкий знак в dentranslify всегда будут в верхнем регистре
+    # потому что ` и ' не несут информацию о регистре
+    return russian
+
+
+def slugify(in_string):
+    """
+    Prepare string for slug (i.e. URL or file/dir name)
+
+    @param in_string: input string
+    @type in_string: C{basestring}
+
+    @return: slug-string
+    @rtype: C{str}
+
+    @raise ValueError: if in_string is C{str}, but it isn't ascii
+    """
+    try:
+        u_in_string = six.text_type(in_string).lower()
+    except UnicodeDecodeError:
+        raise ValueError(
+            "We expects when in_string is str type,")
+    # convert & to "and"
+    u_in_string = re.sub(r'\&amp\;|\&', ' and ', u_in_string)
+    # replace spaces by hyphen
+    u_in_string = re.sub(r'[-\s]+', '-', u_in_string)
+    # remove symbols that not in alphabet
+    u_in_string = u''.join([symb for symb in u_in_string if symb in ALPHABET])
+    # translify it
+    out_string = translify(u_in_string)
+    # remove non-alpha
+    return re.sub(r'[^\w\s-]', '', out_string).strip().lower()
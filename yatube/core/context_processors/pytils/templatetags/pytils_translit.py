@@ -4,6 +4,8 @@
 pytils.translit templatetags for Django web-framework
 """
 
+from functools import lru_cache, wraps
+
 from django import template, conf
 from core.context_processors.pytils import translit
 from core.context_processors.pytils.templatetags import init_defaults
@@ -19,12 +21,36 @@ register = template.Library()
 debug = conf.settings.DEBUG
 encoding = conf.settings.DEFAULT_CHARSET
 show_value = getattr(conf.settings, 'PYTILS_SHOW_VALUES_ON_ERROR', False)
+cache_size = getattr(conf.settings, 'PYTILS_TRANSLIT_CACHE_SIZE', 1024)
 
 default_value, default_uvalue = init_defaults(debug, show_value)
+translit.set_cache_size(cache_size)
+
+# -- caching --
+
+
+def memoize(function):
+    """
+    Bounded LRU cache of a filter for str values, the rest, lazy
+    translations included, is passed through
+    """
+    cached = lru_cache(maxsize=cache_size)(function)
+
+    @wraps(function)
+    def wrapper(text):
+        if isinstance(text, str):
+            return cached(text)
+        return function(text)
+
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
 
 # -- filters --
 
 
+@memoize
 def translify(text):
     """Translify russian text"""
     try:
@@ -35,6 +61,7 @@ def translify(text):
     return res
 
 
+@memoize
 def detranslify(text):
     """Detranslify russian text"""
     try:
@@ -45,6 +72,7 @@ def detranslify(text):
     return res
 
 
+@memoize
 def slugify(text):
     """Make slug from (russian) text"""
     try:
@@ -55,6 +83,27 @@ def slugify(text):
     return res
 
 
+# -- cache counters --
+
+
+def cache_info():
+    """Hits and misses of the filters by name"""
+    return {
+        name: function.cache_info()
+        for name, function in (
+            ('translify', translify),
+            ('detranslify', detranslify),
+            ('slugify', slugify),
+        )
+    }
+
+
+def cache_clear():
+    """Forget cached values of the filters"""
+    for function in (translify, detranslify, slugify):
+        function.cache_clear()
+
+
 # -- register filters
 register.filter('translify', translify)
 register.filter('detranslify', detranslify)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Optimized transliteration against the sequential reference
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from core.context_processors.pytils import legacy, translit
+from core.context_processors.pytils.corpora import (
+    SAMPLE, random_latin, random_texts)
+from core.context_processors.pytils.templatetags import pytils_translit
+
+
+class TranslitEquivalenceTests(SimpleTestCase):
+    def setUp(self) -> None:
+        # long texts take the replace path of translify, short ones the
+        # single scan of detranslify
+        self.texts = [
+            SAMPLE, SAMPLE.lower(), SAMPLE.upper(), SAMPLE * 5, u''
+        ] + random_texts() + random_texts(count=20, length=500) + (
+            random_texts(length=20))
+
+    def test_translify(self) -> None:
+        """Single pass translify gives the replace loop output"""
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    translit.translify(text, strict=False),
+                    legacy.translify(text, strict=False)
+                )
+
+    def test_translify_strict(self) -> None:
+        """Incomplete transliteration still fails in strict mode"""
+        with self.assertRaises(ValueError):
+            translit.translify(u'ü')
+        self.assertEqual(translit.translify(u'\x80'), u'\x80')
+
+    def test_detranslify(self) -> None:
+        """Reduced table gives the full table output"""
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    translit.detranslify(text), legacy.detranslify(text))
+
+    def test_detranslify_precedence(self) -> None:
+        """Table order wins over the leftmost symbol"""
+        self.assertEqual(translit.detranslify(u'tsch'), u'тщ')
+        self.assertEqual(translit.detranslify(u'TSch'), u'ТЩ')
+        self.assertEqual(translit.detranslify(u'....'), u'….')
+        for text in random_latin():
+            with self.subTest(text=text):
+                self.assertEqual(
+                    translit.detranslify(text), legacy.detranslify(text))
+
+    def test_slugify(self) -> None:
+        """Set based filtering keeps the same symbols"""
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    translit.slugify(text), legacy.slugify(text))
+
+
+class FilterCacheTests(SimpleTestCase):
+    def setUp(self) -> None:
+        pytils_translit.cache_clear()
+
+    def test_repeated_values_hit(self) -> None:
+        """Repeated names are transliterated once"""
+        for _ in range(3):
+            self.assertEqual(
+                pytils_translit.slugify(u'Лев Толстой'), u'lev-tolstoj')
+        info = pytils_translit.cache_info()['slugify']
+        self.assertEqual((info.hits, info.misses), (2, 1))
+        self.assertEqual(
+            info.maxsize, settings.PYTILS_TRANSLIT_CACHE_SIZE)
+
+    def test_cached_output(self) -> None:
+        """Cached filters give the uncached output"""
+        for name in ('translify', 'detranslify', 'slugify'):
+            function = getattr(pytils_translit, name)
+            for text in (SAMPLE, u'', 1, 1.0, u'ü'):
+                with self.subTest(name=name, text=text):
+                    self.assertEqual(
+                        function(text), function.__wrapped__(text))
+                    self.assertEqual(
+                        function(text), function.__wrapped__(text))
+
+    def test_passed_through(self) -> None:
+        """Values other than str, lazy translations too, are not cached"""
+        self.assertEqual(pytils_translit.slugify([u'Лев']), u'lev')
+        self.assertEqual(
+            pytils_translit.slugify(gettext_lazy(u'Лев')), u'lev')
+        self.assertEqual(pytils_translit.slugify(1), u'1')
+        info = pytils_translit.cache_info()['slugify']
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 0, 0))
+
+
+class TranslitCacheTests(SimpleTestCase):
+    def setUp(self) -> None:
+        translit.cache_clear()
+
+    def tearDown(self) -> None:
+        translit.set_cache_size(settings.PYTILS_TRANSLIT_CACHE_SIZE)
+
+    def test_repeated_texts_hit(self) -> None:
+        """Module functions remember their results too"""
+        for _ in range(3):
+            self.assertEqual(translit.translify(u'Лев', strict=False), u'Lev')
+        info = translit.cache_info()['translify']
+        self.assertEqual((info.hits, info.misses), (2, 1))
+        self.assertEqual(info.maxsize, settings.PYTILS_TRANSLIT_CACHE_SIZE)
+
+    def test_cache_size(self) -> None:
+        """Size comes from the settings through the filters, 0 is off"""
+        translit.set_cache_size(0)
+        translit.detranslify(u'Lev')
+        translit.detranslify(u'Lev')
+        info = translit.cache_info()['detranslify']
+        self.assertEqual((info.hits, info.maxsize, info.currsize), (0, 0, 0))
+
+    def test_uncached_functions_kept(self) -> None:
+        """Uncached functions stay reachable for the benchmark"""
+        self.assertEqual(
+            translit.slugify.__wrapped__(u'Лев Толстой'), u'lev-tolstoj')
+        self.assertEqual(translit.cache_info()['slugify'].misses, 0)
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def test_results_saved_and_compared(self) -> None:
+        """Results are saved as JSON and read back as a baseline"""
+        options = {'titles': 5, 'post_size': 100, 'repeat': 1}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'translit.json')
+            call_command(
+                'benchmark_translit', output=path, stdout=StringIO(),
+                **options)
+            with open(path) as output:
+                data = json.load(output)
+            stdout = StringIO()
+            call_command(
+                'benchmark_translit', baseline=path, stdout=stdout,
+                **options)
+        self.assertEqual(data['corpora']['titles']['texts'], 5)
+        self.assertEqual(len(data['results']), 18)
+        for result in data['results']:
+            self.assertGreater(result['ops_per_sec'], 0)
+            self.assertGreaterEqual(result['peak_bytes'], 0)
+        self.assertEqual(stdout.getvalue().count(' x'), 18)
+
+    def test_bad_baseline(self) -> None:
+        """Missing baseline is reported as a command error"""
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_translit', baseline='/nonexistent.json',
+                titles=1, post_size=10, repeat=1, stdout=StringIO())
@@ -5,6 +5,8 @@ Simple transliteration
 """
 
 import re
+from functools import lru_cache, wraps
+
 from core.context_processors.pytils.third import six
 
 TRANSTABLE = (
@@ -132,8 +134,73 @@ TRANSTABLE = (
 RU_ALPHABET = [x[0] for x in TRANSTABLE]  #: Russian alphabet
 EN_ALPHABET = [x[1] for x in TRANSTABLE]  #: English alphabet
 ALPHABET = RU_ALPHABET + EN_ALPHABET  #: Alphabet that we can (de)transliterate
+ALPHABET_SET = frozenset(ALPHABET)  #: Alphabet for membership checks
+
+
+def _effective_pairs(pairs):
+    """
+    Pairs which change anything, the first one of each symbol
+
+    Sequential replaces of later pairs of a symbol find nothing, since
+    replacements bring in only symbols of the other alphabet.
+    """
+    effective = {}
+    for symb_in, symb_out in pairs:
+        if symb_in != symb_out:
+            effective.setdefault(symb_in, symb_out)
+    return tuple(effective.items())
+
+
+TRANSLIFY_PAIRS = _effective_pairs(TRANSTABLE)  #: Effective translify pairs
+DETRANSTABLE = _effective_pairs(
+    (symb_out, symb_in) for symb_in, symb_out in TRANSTABLE
+)  #: Effective detranslify pairs
+#: str.translate map of the one symbol detranslify pairs
+DETRANSLIFY_MAP = {
+    ord(symb_in): symb_out for symb_in, symb_out in DETRANSTABLE
+    if len(symb_in) == 1
+}
+#: Runs of symbols the longer detranslify pairs are made of, no pair
+#: crosses their bounds
+DETRANSLIFY_RUNS = re.compile(u'[%s]{2,}' % re.escape(u''.join(sorted({
+    symb for symb_in, symb_out in DETRANSTABLE if len(symb_in) > 1
+    for symb in symb_in
+}))))
+#: Longest text for the single scan of detranslify, the replaces run at C
+#: speed and win on longer texts
+DETRANSLIFY_SCAN_MAX_LENGTH = 50
+#: LRU size of translify, detranslify and slugify, see L{set_cache_size}
+CACHE_SIZE = 1024
+#: str.translate map of translify
+TRANSLIFY_MAP = {
+    ord(symb_in): symb_out for symb_in, symb_out in TRANSLIFY_PAIRS
+}
+#: Longest text for str.translate, its per-symbol lookups lose to C speed
+#: replaces of the effective pairs on longer texts
+TRANSLATE_MAX_LENGTH = 200
 
+NOT_TRANSLIFIED = re.compile(r'[^\x00-\x80]')
+AMPERSAND = re.compile(r'\&amp\;|\&')
+SPACES = re.compile(r'[-\s]+')
+NOT_ALPHA = re.compile(r'[^\w\s-]')
 
+
+def memoize(function):
+    """
+    LRU cache of the results for C{unicode} input, other values are
+    passed through. The uncached function is C{__wrapped__}
+    """
+    @wraps(function)
+    def wrapper(in_string, *args, **kwargs):
+        if isinstance(in_string, six.text_type):
+            return wrapper.cached(in_string, *args, **kwargs)
+        return function(in_string, *args, **kwargs)
+
+    wrapper.cached = lru_cache(maxsize=CACHE_SIZE)(function)
+    return wrapper
+
+
+@memoize
 def translify(in_string, strict=True):
     """
     Translify russian text
@@ -151,16 +218,34 @@ def translify(in_string, strict=True):
     @raise ValueError: when string doesn't transliterate completely.
         Raised only if strict=True
     """
-    translit = in_string
-    for symb_in, symb_out in TRANSTABLE:
-        translit = translit.replace(symb_in, symb_out)
+    if len(in_string) <= TRANSLATE_MAX_LENGTH:
+        translit = in_string.translate(TRANSLIFY_MAP)
+    else:
+        translit = in_string
+        for symb_in, symb_out in TRANSLIFY_PAIRS:
+            translit = translit.replace(symb_in, symb_out)
 
-    if strict and any(ord(symb) > 128 for symb in translit):
+    if strict and NOT_TRANSLIFIED.search(translit):
         raise ValueError("Unicode string doesn't transliterate completely")
 
     return translit
 
 
+def _replace_pairs(text):
+    """Effective detranslify pairs replaced in the table order"""
+    for symb_in, symb_out in DETRANSTABLE:
+        text = text.replace(symb_in, symb_out)
+    return text
+
+
+_replace_run = lru_cache(maxsize=1024)(_replace_pairs)
+
+
+def _detranslify_run(match):
+    return _replace_run(match.group())
+
+
+@memoize
 def detranslify(in_string):
     """
     Detranslify
@@ -178,8 +263,14 @@ def detranslify(in_string):
     except UnicodeDecodeError:
         raise ValueError("We expects if in_string is 8-bit string")
 
-    for symb_out, symb_in in TRANSTABLE:
-        russian = russian.replace(symb_in, symb_out)
+    # order of the table is the precedence: "tsch" is "тщ", not "цч",
+    # so runs which may hold longer pairs are replaced in the table order,
+    # and the one symbol pairs left are translated at once. Replacements
+    # are not ascii, the translate does not touch them
+    if len(russian) <= DETRANSLIFY_SCAN_MAX_LENGTH:
+        return DETRANSLIFY_RUNS.sub(_detranslify_run, russian).translate(
+            DETRANSLIFY_MAP)
+    russian = _replace_pairs(russian)
 
     # TODO: выбрать правильный регистр для ь и ъ
     # твердый и мягкий знак в dentranslify всегда будут в верхнем регистре
@@ -187,6 +278,7 @@ def detranslify(in_string):
     return russian
 
 
+@memoize
 def slugify(in_string):
     """
     Prepare string for slug (i.e. URL or file/dir name)
@@ -205,15 +297,43 @@ def slugify(in_string):
         raise ValueError(
             "We expects when in_string is str type,")
     # convert & to "and"
-    u_in_string = re.sub(r'\&amp\;|\&', ' and ', u_in_string)
+    u_in_string = AMPERSAND.sub(' and ', u_in_string)
     # replace spaces by hyphen
-    u_in_string = re.sub(r'[-\s]+', '-', u_in_string)
+    u_in_string = SPACES.sub('-', u_in_string)
     # remove symbols that not in alphabet
-    u_in_string = u''.join([symb for symb in u_in_string if symb in ALPHABET])
-    # translify it
-    out_string = translify(u_in_string)
+    u_in_string = u''.join(
+        [symb for symb in u_in_string if symb in ALPHABET_SET])
+    # translify it, the slug is cached already
+    out_string = translify.__wrapped__(u_in_string)
     # remove non-alpha
-    return re.sub(r'[^\w\s-]', '', out_string).strip().lower()
+    return NOT_ALPHA.sub('', out_string).strip().lower()
+
+
+def set_cache_size(maxsize):
+    """
+    Resize the caches of translify, detranslify and slugify, 0 turns
+    them off. Cached values are forgotten
+    """
+    for function in (translify, detranslify, slugify):
+        function.cached = lru_cache(maxsize=maxsize)(function.__wrapped__)
+
+
+def cache_info():
+    """
+    Hits and misses of the cached functions by name
+    """
+    return {
+        function.__name__: function.cached.cache_info()
+        for function in (translify, detranslify, slugify)
+    }
+
+
+def cache_clear():
+    """
+    Forget cached values of translify, detranslify and slugify
+    """
+    for function in (translify, detranslify, slugify):
+        function.cached.cache_clear()
 
 
 def dirify(in_string):
@@ -0,0 +1,135 @@
+"""Media files served with validators, byte ranges and proxy offloading"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# names made of a digest never change, e.g. posts/3f/3f2a...9c.jpg and
+# the sorl thumbnails under cache/
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{32,64}\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def get_etag(name, stat):
+    """Digest of hashed names, size and modification time otherwise"""
+    match = HASHED_NAME.search(name)
+    if match:
+        return '"%s"' % os.path.splitext(name[match.end(1):])[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    """(start, end) of a single byte range, None to send the whole file.
+
+    Raises ValueError when the range can not be satisfied. Multiple
+    ranges are answered with the whole file, which RFC 7233 allows.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def send_by_proxy(name, path):
+    """Empty response telling the front proxy which file to send"""
+    response = HttpResponse()
+    mode = settings.CUSTOM_SETTINGS['MEDIA_SENDFILE']
+    if mode == 'X-Accel-Redirect':
+        response[mode] = settings.CUSTOM_SETTINGS['MEDIA_ACCEL_PREFIX'] + name
+    else:
+        response[mode] = path
+    # the proxy sets the type of the file it sends
+    del response['Content-Type']
+    return response
+
+
+def send_file(request, path, size, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range not in (None, etag, http_date(last_modified)):
+        header = None
+    try:
+        byte_range = parse_range(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'))
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        read_range(path, start, end - start + 1), status=206)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Media file with strong ETag, Last-Modified and Range support.
+
+    Digest named files are cached for a year. With MEDIA_SENDFILE set,
+    the checks are done here and the bytes are sent by the proxy.
+    """
+    name = path.lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(name)
+    if not os.path.isfile(full_path):
+        raise Http404(name)
+    etag = get_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.CUSTOM_SETTINGS['MEDIA_SENDFILE']:
+            response = send_by_proxy(name, full_path)
+        else:
+            response = send_file(
+                request, full_path, stat.st_size, etag, last_modified)
+            content_type, encoding = mimetypes.guess_type(full_path)
+            response['Content-Type'] = (
+                content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if HASHED_NAME.search(name):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+    else:
+        response['Cache-Control'] = (
+            f"public, max-age={settings.CUSTOM_SETTINGS['MEDIA_MAX_AGE']}")
+    return response
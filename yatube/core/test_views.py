@@ -1,6 +1,15 @@
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+digest = 'ab' * 32
 
 
 class TestCoreViews(TestCase):
@@ -9,3 +18,97 @@ class TestCoreViews(TestCase):
         response = self.client.get('/unexpected-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND.value)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestMediaView(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'ab'))
+        cls.hashed = f'posts/ab/{digest}.jpg'
+        cls.plain = 'notes.txt'
+        for name in (cls.hashed, cls.plain):
+            with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as file:
+                file.write(b'0123456789')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name, **headers):
+        return self.client.get(settings.MEDIA_URL + name, **headers)
+
+    def test_hashed_file_is_immutable(self) -> None:
+        """Digest named file has its digest as ETag and a year to live"""
+        response = self.get(self.hashed)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertNotIn('immutable', self.get(self.plain)['Cache-Control'])
+
+    def test_validators_give_not_modified(self) -> None:
+        """Matching ETag or date is answered with 304"""
+        response = self.get(self.plain)
+        self.assertEqual(
+            self.get(
+                self.plain, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED
+        )
+        self.assertEqual(
+            self.get(
+                self.plain, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED
+        )
+
+    def test_ranges(self) -> None:
+        """Single ranges are partial, wrong ones unsatisfiable"""
+        cases = {
+            'bytes=2-4': (b'234', 'bytes 2-4/10'),
+            'bytes=7-': (b'789', 'bytes 7-9/10'),
+            'bytes=-2': (b'89', 'bytes 8-9/10'),
+        }
+        for header, (body, content_range) in cases.items():
+            with self.subTest(range=header):
+                response = self.get(self.hashed, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+        response = self.get(self.hashed, HTTP_RANGE='bytes=20-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_sends_whole_file(self) -> None:
+        """Range is ignored when If-Range does not match"""
+        response = self.get(
+            self.hashed, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE=http_date(0))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_paths_outside_media_are_not_found(self) -> None:
+        """Traversal and missing files give 404"""
+        for name in ('../settings.py', 'posts', 'missing.jpg'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.get(name).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_sendfile_modes(self) -> None:
+        """Proxy modes send no body, only the file location"""
+        modes = {
+            'X-Sendfile': os.path.join(TEMP_MEDIA_ROOT, self.hashed),
+            'X-Accel-Redirect': '/protected-media/' + self.hashed,
+        }
+        for mode, location in modes.items():
+            with self.subTest(mode=mode), override_settings(
+                CUSTOM_SETTINGS={
+                    **settings.CUSTOM_SETTINGS, 'MEDIA_SENDFILE': mode}
+            ):
+                response = self.get(self.hashed)
+                self.assertEqual(response[mode], location)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], f'"{digest}"')
@@ -0,0 +1,134 @@
+"""Denormalized counters kept in sync with F() expressions"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+BATCH_SIZE = 500
+
+
+def shift(queryset, field, delta):
+    """Atomically adds delta to the counter, never going below zero"""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('id')).values('total')
+    ), 0)
+
+
+def count_user(user_id):
+    """All counters of the user in a single query"""
+    counts = User.objects.filter(pk=user_id).values(
+        posts_count=_count_related(Post, 'author'),
+        followers_count=_count_related(Follow, 'author'),
+        following_count=_count_related(Follow, 'user'),
+    ).first()
+    return counts or dict.fromkeys(
+        ('posts_count', 'followers_count', 'following_count'), 0)
+
+
+def user_stats(user_id):
+    """Returns counters of the user, counting them on first access"""
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats = UserStats(user_id=user_id, **count_user(user_id))
+        UserStats.objects.bulk_create([stats], ignore_conflicts=True)
+    return stats
+
+
+def shift_user(user_id, field, delta):
+    updated = shift(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        # missing stats are counted after the change is already saved
+        user_stats(user_id)
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def shift_post(post_id, delta):
+    shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _grouped_count(queryset, field):
+    return dict(queryset.order_by().values(field).annotate(
+        total=Count('id')).values_list(field, 'total'))
+
+
+def _batches(queryset, batch_size):
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = ids if last is None else ids.filter(pk__gt=last)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def reconcile_users(batch_size=BATCH_SIZE):
+    fixed = 0
+    for batch in _batches(User.objects.all(), batch_size):
+        posts = _grouped_count(
+            Post.objects.filter(author_id__in=batch), 'author_id')
+        followers = _grouped_count(
+            Follow.objects.filter(author_id__in=batch), 'author_id')
+        following = _grouped_count(
+            Follow.objects.filter(user_id__in=batch), 'user_id')
+        stored = UserStats.objects.in_bulk(batch)
+        missing, drifted = [], []
+        for user_id in batch:
+            actual = UserStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            stats = stored.get(user_id)
+            if stats is None:
+                missing.append(actual)
+            elif (stats.posts_count, stats.followers_count,
+                  stats.following_count) != (actual.posts_count,
+                                             actual.followers_count,
+                                             actual.following_count):
+                drifted.append(actual)
+        UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+        UserStats.objects.bulk_update(drifted, [
+            'posts_count', 'followers_count', 'following_count'])
+        fixed += len(missing) + len(drifted)
+    return fixed
+
+
+def _reconcile_field(model, field, counted, related_field, batch_size):
+    fixed = 0
+    for batch in _batches(model.objects.all(), batch_size):
+        actual = _grouped_count(
+            counted.objects.filter(**{f'{related_field}__in': batch}),
+            related_field,
+        )
+        drifted = []
+        for pk, value in model.objects.filter(
+                pk__in=batch).values_list('pk', field):
+            if value != actual.get(pk, 0):
+                drifted.append(model(pk=pk, **{field: actual.get(pk, 0)}))
+        model.objects.bulk_update(drifted, [field])
+        fixed += len(drifted)
+    return fixed
+
+
+def reconcile_groups(batch_size=BATCH_SIZE):
+    return _reconcile_field(Group, 'posts_count', Post, 'group_id',
+                            batch_size)
+
+
+def reconcile_posts(batch_size=BATCH_SIZE):
+    return _reconcile_field(Post, 'comments_count', Comment, 'post_id',
+                            batch_size)
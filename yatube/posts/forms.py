@@ -1,5 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Comment, Post
 
 
@@ -8,6 +11,26 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image', )
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # files refused by the upload handler never reach the fields
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise ValidationError(self.upload_errors['image'])
+        image = self.cleaned_data.get('image')
+        if image is False:
+            self.instance.image_original_size = None
+            self.instance.image_size = None
+            self.instance.image_placeholder = ''
+        elif isinstance(image, UploadedFile):
+            self.instance.image_original_size = image.size
+            image = images.normalize(image)
+            self.instance.image_size = image.size
+            self.instance.image_placeholder = images.placeholder(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,73 @@
+"""Request scoped identity map.
+
+Every Post, User or Group loaded by a view is remembered on the request
+under its primary key and the natural key it was looked up by, so the
+repeated get_object() calls of one request cost a single query.
+Lookups through a filtered queryset are kept apart under its SQL, as
+an object found without filters may not pass them.
+"""
+from django.db.models import Model
+from django.shortcuts import get_object_or_404
+
+
+class IdentityMap:
+    """Loaded objects keyed by model and lookup"""
+    def __init__(self):
+        self._objects = {}
+
+    def _key(self, model, lookup, scope=''):
+        field, value = lookup
+        if field in ('pk', model._meta.pk.name):
+            field = 'pk'
+        return model._meta.label, scope, field, str(value)
+
+    def _scope(self, queryset):
+        """SQL of a filtered queryset or manager, empty for unfiltered"""
+        query = queryset.all().query
+        return str(query) if query.where else ''
+
+    def add(self, obj, *lookups, scope=''):
+        """Remembers obj under its pk, given lookups and loaded relations
+
+        An object which passed the filters of the scope is also found
+        by the unfiltered lookups.
+        """
+        model = type(obj)
+        for lookup in (('pk', obj.pk),) + lookups:
+            self._objects[self._key(model, lookup)] = obj
+            if scope:
+                self._objects[self._key(model, lookup, scope)] = obj
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.is_cached(obj):
+                related = field.get_cached_value(obj)
+                if isinstance(related, Model):
+                    self._objects.setdefault(
+                        self._key(type(related), ('pk', related.pk)),
+                        related
+                    )
+        return obj
+
+    def get(self, queryset, **lookup):
+        """get_object_or_404 that queries each object once per request"""
+        (lookup_item,) = lookup.items()
+        scope = self._scope(queryset)
+        key = self._key(queryset.model, lookup_item, scope)
+        if key not in self._objects:
+            self.add(
+                get_object_or_404(queryset, **lookup), lookup_item,
+                scope=scope)
+        return self._objects[key]
+
+    def clear(self):
+        self._objects.clear()
+
+
+def get_identity_map(request):
+    """Map attached by IdentityMapMiddleware, or a new one for the request"""
+    if not hasattr(request, 'identity_map'):
+        request.identity_map = IdentityMap()
+    return request.identity_map
+
+
+def get_object(request, queryset, **lookup):
+    return get_identity_map(request).get(queryset, **lookup)
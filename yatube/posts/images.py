@@ -0,0 +1,78 @@
+"""Normalization of uploaded post images before they are stored"""
+from base64 import b64encode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+# image info keys that carry metadata rather than pixels
+METADATA = ('exif', 'icc_profile', 'comment', 'xmp', 'photoshop', 'dpi')
+
+# longest side of the inline preview, browsers blur it when scaling up
+PLACEHOLDER_SIZE = 12
+
+SAVE_OPTIONS = {
+    'JPEG': lambda quality: {
+        'quality': quality, 'optimize': True, 'progressive': True},
+    'WEBP': lambda quality: {'quality': quality, 'method': 6},
+    'PNG': lambda quality: {'optimize': True},
+}
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = SAVE_OPTIONS.get(image_format, lambda quality: {})(
+        settings.CUSTOM_SETTINGS['IMAGE_QUALITY'])
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer
+
+
+def normalize(upload):
+    """Capped, metadata free re-encode of the upload in its own format.
+
+    Returns the file to store, the name and format are kept, and the
+    upload itself when re-encoding gains nothing. Animations and formats
+    Pillow reads but can not write, like XPM, are stored as uploaded.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    image_format = image.format
+    if (getattr(image, 'is_animated', False)
+            or image_format not in Image.SAVE):
+        upload.seek(0)
+        return upload
+    has_metadata = any(key in image.info for key in METADATA)
+    image = ImageOps.exif_transpose(image)
+    max_size = settings.CUSTOM_SETTINGS['IMAGE_MAX_SIZE']
+    resized = image.width > max_size[0] or image.height > max_size[1]
+    if resized:
+        image.thumbnail(max_size, Image.LANCZOS)
+    buffer = _encode(image, image_format)
+    size = buffer.tell()
+    if not (resized or has_metadata) and size >= upload.size:
+        upload.seek(0)
+        return upload
+    buffer.seek(0)
+    return InMemoryUploadedFile(
+        buffer,
+        field_name=getattr(upload, 'field_name', None),
+        name=upload.name,
+        content_type=Image.MIME.get(image_format),
+        size=size,
+        charset=None,
+    )
+
+
+def placeholder(upload):
+    """Data URI of a tiny PNG preview, some hundreds of bytes"""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        preview = ImageOps.exif_transpose(image).convert('RGB')
+    upload.seek(0)
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BOX)
+    buffer = BytesIO()
+    preview.save(buffer, 'PNG', optimize=True)
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
@@ -0,0 +1,80 @@
+"""sorl key value store with a bounded in-process LRU in front"""
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+from django.conf import settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class LRUKVStore(cached_db_kvstore.KVStore):
+    """Cached database store answering repeated lookups from memory.
+
+    Entries live THUMBNAIL_LRU_TIMEOUT seconds, which bounds how long a
+    write of another process stays unseen. Writes and deletes of this
+    process, the thumbnail pool included, update the LRU at once.
+    """
+    def __init__(self):
+        super().__init__()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        return settings.CUSTOM_SETTINGS['THUMBNAIL_LRU_SIZE']
+
+    def _remember(self, key, value):
+        expires = monotonic() + settings.CUSTOM_SETTINGS[
+            'THUMBNAIL_LRU_TIMEOUT']
+        with self._lock:
+            self._lru[key] = (value, expires)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def _get_raw(self, key):
+        if not self.maxsize:
+            return super()._get_raw(key)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry[1] > monotonic():
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = super()._get_raw(key)
+        self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        if self.maxsize:
+            self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def get_thumbnail_keys(self, image_file):
+        """Keys of the thumbnails stored for the source image"""
+        return set(self._get(image_file.key, identity='thumbnails') or ())
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.cache_clear()
+
+    def cache_info(self):
+        """Hit and miss counters in the shape of functools.lru_cache"""
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, len(self._lru))
+
+    def cache_clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.misses = 0
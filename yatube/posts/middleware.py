@@ -0,0 +1,68 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .identity import IdentityMap
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class IdentityMapMiddleware:
+    """Gives every request its own identity map and drops it afterwards"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.identity_map = IdentityMap()
+        try:
+            return self.get_response(request)
+        finally:
+            request.identity_map.clear()
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries of one request"""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Checks number of queries against budget of the resolved URL name.
+
+    Budgets are set in CUSTOM_SETTINGS['QUERY_BUDGETS'] by view name
+    like 'posts:index'. Requests over budget are logged, or rejected
+    with QueryBudgetExceeded when QUERY_BUDGET_MODE is 'raise'.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        self.check_budget(request, counter.count)
+        return response
+
+    def check_budget(self, request, count):
+        match = request.resolver_match
+        budget = match and settings.CUSTOM_SETTINGS['QUERY_BUDGETS'].get(
+            match.view_name)
+        if budget is None or count <= budget:
+            return
+        message = (f'{match.view_name} made {count} queries '
+                   f'with budget of {budget}: {request.path}')
+        if settings.CUSTOM_SETTINGS['QUERY_BUDGET_MODE'] == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
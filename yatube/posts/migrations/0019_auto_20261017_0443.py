@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:43
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20261017_0442'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='This is how I see it', null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='picture'),
+        ),
+    ]
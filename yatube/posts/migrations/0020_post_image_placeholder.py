@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_auto_20261017_0443'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Data URI of a tiny preview shown while the image loads', verbose_name='image placeholder'),
+        ),
+    ]
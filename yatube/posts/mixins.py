@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from . import versions
+from .paginators import CursorPaginator, WindowedPaginator
+from .uploads import ImageUploadHandler
+
+
+class CursorPaginationMixin:
+    """Opt-in keyset pagination for ListView.
+
+    Pages are addressed with opaque ?cursor= tokens, while old ?page=N
+    links are still served by the regular offset paginator.
+    """
+    cursor_kwarg = 'cursor'
+    cursor_keys = ('pub_date', 'id')
+    paginator_class = WindowedPaginator
+
+    def get_count_estimate(self):
+        """Stored number of listed posts, None to count through cache"""
+        return None
+
+    def get_count_scopes(self):
+        """Version scopes of the cached count, see versions.get_versions"""
+        return ((versions.POSTS, ''),)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return super().get_paginator(
+            queryset,
+            per_page,
+            count=self.get_count_estimate(),
+            count_scopes=self.get_count_scopes(),
+            **kwargs
+        )
+
+    def is_cursor_mode(self):
+        """Keyset pages are asked for with ?cursor=, empty for the first"""
+        return self.cursor_kwarg in self.request.GET and not (
+            self.request.GET.get(self.page_kwarg)
+            or self.kwargs.get(self.page_kwarg))
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.order_by(
+            *('-' + key for key in self.cursor_keys))
+        if not self.is_cursor_mode():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset,
+            page_size,
+            keys=self.cursor_keys,
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as error:
+            raise Http404(str(error))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_mode'] = self.is_cursor_mode()
+        if context['is_paginated'] and not context['cursor_mode']:
+            context['page_window'] = context['paginator'].get_page_window(
+                context['page_obj'].number)
+        return context
+
+
+class VersionedCacheMixin:
+    """Passes versions of the shown namespaces to {% cache %} tags.
+
+    Templates put cache_version into the fragment key, so any write to
+    a listed namespace makes the cached fragment unreachable.
+    """
+    def get_cache_scopes(self, context):
+        """(namespace, key) pairs the rendered page depends on"""
+        return [(versions.POSTS, '')]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_timeout'] = settings.CUSTOM_SETTINGS[
+            'PAGE_CACHE_TIMEOUT']
+        context['cache_version'] = versions.get_versions(
+            *self.get_cache_scopes(context))
+        return context
+
+
+class ImageUploadMixin:
+    """Form view streaming its uploads through ImageUploadHandler.
+
+    Upload handlers can not change once the body is read, and
+    CsrfViewMiddleware reads it, so the view is exempt from the
+    middleware and checks the token itself after installing the handler.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        self.upload_handler = ImageUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['upload_errors'] = self.upload_handler.errors
+        return kwargs
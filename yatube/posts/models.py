@@ -4,6 +4,9 @@ from django.db import models
 from core.models import CreatedModel
 from core.context_processors.pytils.templatetags.pytils_translit import slugify
 
+from . import slugs
+from .storage import post_images
+
 User = get_user_model()
 
 
@@ -28,13 +31,29 @@ class Group(models.Model):
         help_text='Enter the description of the Group',
         verbose_name='group description'
     )
+    posts_count = models.PositiveIntegerField(
+        'posts in group',
+        default=0,
+        editable=False
+    )
+
+    def get_slug_base(self) -> str:
+        return slugify(self.slug) or slugify(self.title)
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.slug)
-        if not self.slug:
-            self.slug = slugify(self.title)[:50]
+        self.slug = slugs.unique_slug(
+            Group, self.get_slug_base(), exclude_pk=self.pk)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bulk_create_unique(cls, groups, batch_size=slugs.BATCH_SIZE):
+        """bulk_create() of groups given free slugs as save() does"""
+        new_slugs = slugs.unique_slugs(
+            cls, [group.get_slug_base() for group in groups])
+        for group, slug in zip(groups, new_slugs):
+            group.slug = slug
+        return cls.objects.bulk_create(groups, batch_size=batch_size)
+
     def __str__(self) -> str:
         return self.title
 
@@ -53,7 +72,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='post author'
+        verbose_name='post author',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -62,18 +82,51 @@ class Post(models.Model):
         blank=True,
         null=True,
         help_text='Select one of the following groups or nothing',
-        verbose_name='post group'
+        verbose_name='post group',
+        db_index=False
     )
     image = models.ImageField(
         'picture',
         upload_to='posts/',
+        storage=post_images,
         blank=True,
         null=True,
         help_text='This is how I see it'
     )
+    image_original_size = models.PositiveIntegerField(
+        'uploaded image bytes',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'stored image bytes',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'image placeholder',
+        blank=True,
+        editable=False,
+        help_text='Data URI of a tiny preview shown while the image loads'
+    )
+    comments_count = models.PositiveIntegerField(
+        'comments to post',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'], name='post_group'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'], name='post_author'
+            ),
+        ]
         verbose_name = 'post'
         verbose_name_plural = 'posts'
 
@@ -85,7 +138,8 @@ class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -100,6 +154,9 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created'], name='comment_post'),
+        ]
         verbose_name = 'comment'
         verbose_name_plural = 'comments'
 
@@ -112,11 +169,13 @@ class Follow(CreatedModel):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
@@ -125,6 +184,66 @@ class Follow(CreatedModel):
                 fields=['user', 'author'], name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'], name='follow_author'),
+        ]
 
     def __str__(self) -> str:
         return 'Follow / Unfolow'
+
+
+class UserStats(models.Model):
+    """Denormalized counters of the user activity"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('posts', default=0)
+    followers_count = models.PositiveIntegerField('followers', default=0)
+    following_count = models.PositiveIntegerField('following', default=0)
+
+    class Meta:
+        verbose_name = 'user stats'
+        verbose_name_plural = 'user stats'
+
+    def __str__(self) -> str:
+        return f'Stats of {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    """Post delivered into the follow feed of the user"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('date of publication')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'], name='timeline_feed'
+            ),
+            models.Index(fields=['user', 'author'], name='timeline_author'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user_id} <- {self.post_id}'
@@ -0,0 +1,170 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .versions import POSTS, get_versions
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(obj, keys, direction):
+    """Makes opaque token pointing at obj position in keyset ordering"""
+    date_key, id_key = keys
+    raw = '|'.join((
+        direction,
+        getattr(obj, date_key).isoformat(),
+        str(getattr(obj, id_key)),
+    ))
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Returns (direction, date, id) stored in the token"""
+    try:
+        direction, date, pk = force_text(
+            urlsafe_base64_decode(cursor)).split('|')
+        date, pk = parse_datetime(date), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor('That cursor is not valid')
+    if direction not in (NEXT, PREVIOUS) or date is None:
+        raise InvalidCursor('That cursor is not valid')
+    return direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator over (date, id) pair, newest first.
+
+    Every page costs one indexed range query with LIMIT per_page + 1,
+    no OFFSET and no COUNT(*). Only neighbour pages are known, so
+    num_pages describes the pages reachable from the current one.
+    """
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.keys = keys
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + int(self._has_next)
+
+    def get_keyset_queryset(self, direction, date, pk):
+        """Query of the page after (date, pk) in the given direction"""
+        date_key, id_key = self.keys
+        queryset = self.object_list
+        if direction == PREVIOUS:
+            ordering = (date_key, id_key)
+            lookup = 'gt'
+        else:
+            ordering = ('-' + date_key, '-' + id_key)
+            lookup = 'lt'
+        if date is not None:
+            queryset = queryset.filter(
+                Q(**{f'{date_key}__{lookup}': date})
+                | Q(**{date_key: date, f'{id_key}__{lookup}': pk})
+            )
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        direction, date, pk = NEXT, None, None
+        if cursor:
+            direction, date, pk = decode_cursor(cursor)
+        rows = list(self.get_keyset_queryset(direction, date, pk))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = date is not None, has_more
+        if not rows and (date is not None or not self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+
+        self._number = 2 if has_previous else 1
+        self._has_next = has_next and bool(rows)
+        page = Page(rows, self._number, self)
+        page.next_cursor = page.previous_cursor = None
+        if page.has_next():
+            page.next_cursor = encode_cursor(rows[-1], self.keys, NEXT)
+        if page.has_previous():
+            page.previous_cursor = encode_cursor(
+                rows[0], self.keys, PREVIOUS)
+        return page
+
+
+class WindowedPaginator(Paginator):
+    """Offset paginator with cheap counting and a short page range.
+
+    Total count comes from the stored estimate passed by the view or
+    from a count cached until the next version of count_scopes, all
+    posts by default, and the last page
+    corrects it with the number of rows actually fetched. Only a window
+    of pages around the current one is meant to be rendered.
+    """
+    def __init__(self, object_list, per_page, count=None,
+                 count_scopes=((POSTS, ''),), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = count
+        self.count_scopes = count_scopes
+
+    @cached_property
+    def count(self):
+        if self.estimate is not None:
+            return self.estimate
+        key = 'paginator:count:{}:{}'.format(
+            get_versions(*self.count_scopes),
+            md5(force_bytes(self.object_list.query)).hexdigest(),
+        )
+        return cache.get_or_set(
+            key,
+            lambda: Paginator.count.func(self),
+            settings.CUSTOM_SETTINGS['PAGINATOR_COUNT_TIMEOUT'],
+        )
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage('That page contains no results')
+        fetched = bottom + len(rows)
+        if len(rows) <= self.per_page or self.count < fetched:
+            self.count = fetched
+            self.__dict__.pop('num_pages', None)
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page_window(self, number, on_each_side=2, on_ends=1):
+        """Page numbers around the current one, None marks skipped pages"""
+        last = self.num_pages
+        shown = set(range(1, min(on_ends, last) + 1))
+        shown.update(range(max(last - on_ends + 1, 1), last + 1))
+        shown.update(range(max(number - on_each_side, 1),
+                           min(number + on_each_side, last) + 1))
+        window, previous = [], 0
+        for page in sorted(shown):
+            if page - previous == 2:
+                window.append(previous + 1)
+            elif page - previous > 2:
+                window.append(None)
+            window.append(page)
+            previous = page
+        return window
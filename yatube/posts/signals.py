@@ -0,0 +1,128 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, storage, thumbnails, timeline, versions
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    # new user has nothing to count, so stats never hit the lazy path
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    if instance.pk is not None:
+        instance._saved_group_id, instance._saved_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+        instance._saved_image = instance._saved_image or None
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_user(instance.author_id, 'posts_count', 1)
+        counters.shift_group(instance.group_id, 1)
+        timeline.push_post(instance)
+    elif instance._saved_group_id != instance.group_id:
+        counters.shift_group(instance._saved_group_id, -1)
+        counters.shift_group(instance.group_id, 1)
+
+
+@receiver(post_save, sender=Post)
+def image_changed(sender, instance, raw=False, **kwargs):
+    if raw or (instance.image.name or None) == instance._saved_image:
+        return
+    if instance.image:
+        thumbnails.enqueue_on_commit(instance.image.name)
+    storage.release(instance._saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    storage.release(instance.image.name)
+    counters.shift_user(instance.author_id, 'posts_count', -1)
+    counters.shift_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.shift_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_user(instance.author_id, 'followers_count', 1)
+        counters.shift_user(instance.user_id, 'following_count', 1)
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, 'followers_count', -1)
+    counters.shift_user(instance.user_id, 'following_count', -1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+def _group_slugs(*group_ids):
+    return Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk is not None]
+    ).values_list('slug', flat=True)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, **kwargs):
+    group_ids = {instance.group_id, getattr(instance, '_saved_group_id', None)}
+    versions.bump(
+        (versions.POSTS, ''),
+        (versions.AUTHOR, instance.author.username),
+        (versions.POST, instance.pk),
+        *((versions.GROUP, slug) for slug in _group_slugs(*group_ids)),
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # posts lose their group by a bulk update which sends no signals
+    instance._author_names = list(User.objects.filter(
+        posts__group=instance
+    ).values_list('username', flat=True).distinct())
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_versions(sender, instance, **kwargs):
+    versions.bump(
+        (versions.POSTS, ''),
+        (versions.GROUP, instance.slug),
+        *((versions.AUTHOR, name)
+          for name in getattr(instance, '_author_names', ())),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    versions.bump((versions.POST, instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_versions(sender, instance, **kwargs):
+    versions.bump(
+        (versions.AUTHOR, instance.author.username),
+        (versions.FEED, instance.user_id),
+    )
@@ -0,0 +1,55 @@
+"""Unique slugs picked from the taken ones instead of retried saves"""
+from itertools import count
+
+from django.db.models import Q
+
+BATCH_SIZE = 500
+# room left for a -N suffix, prefixes are cut before it
+SUFFIX_ROOM = len('-99999')
+
+
+def _fit(base, number, max_length):
+    if number == 1:
+        return base[:max_length]
+    suffix = f'-{number}'
+    return base[:max_length - len(suffix)] + suffix
+
+
+def _first_free(base, taken, max_length):
+    """base, base-2, base-3... cut to max_length, first one not taken"""
+    for number in count(1):
+        slug = _fit(base, number, max_length)
+        if slug not in taken:
+            return slug
+
+
+def unique_slugs(model, bases, field='slug', exclude_pk=None):
+    """Free slugs for bases, distinct among themselves as well.
+
+    Slugs sharing a prefix with any base are read with one query per
+    BATCH_SIZE bases, the suffixes are picked in memory. The unique
+    constraint still guards against concurrent writers.
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [base or model._meta.model_name for base in bases]
+    prefixes = sorted({base[:max_length - SUFFIX_ROOM] for base in bases})
+    taken = set()
+    for start in range(0, len(prefixes), BATCH_SIZE):
+        query = Q()
+        for prefix in prefixes[start:start + BATCH_SIZE]:
+            query |= Q(**{f'{field}__startswith': prefix})
+        queryset = model._default_manager.filter(query)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        taken.update(queryset.values_list(field, flat=True))
+    slugs = []
+    for base in bases:
+        slug = _first_free(base, taken, max_length)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def unique_slug(model, base, field='slug', exclude_pk=None):
+    """Free slug for base read with a single query"""
+    return unique_slugs(model, [base], field, exclude_pk)[0]
@@ -0,0 +1,96 @@
+"""Content addressed storage shared by all post images"""
+import hashlib
+import logging
+import os
+from time import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Names files by hash of their content, so equal files are one blob.
+
+    The upload_to directory is kept and the hash is split into a short
+    subdirectory, e.g. posts/3f/3f2a...9c.jpg. Saving a blob that already
+    exists only touches it and returns its name.
+    """
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.touch(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def touch(self, name):
+        """Marks the blob as just used, False if there is no such blob"""
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+
+post_images = ContentAddressedStorage()
+
+
+def delete_unused(name, grace=None):
+    """Deletes the blob and its thumbnails if no post refers to it.
+
+    A post saved in another transaction may reuse the blob before its row
+    is visible here. The blob is moved aside first, so such a save finds
+    it missing and writes it again, and blobs touched within the grace,
+    IMAGE_REUSE_GRACE seconds by default, are put back and left for the
+    collect_media command.
+    """
+    from .models import Post
+
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    try:
+        path = post_images.path(name)
+        doomed = f'{path}.deleted'
+        os.replace(path, doomed)
+    except (SuspiciousFileOperation, OSError):
+        logger.warning('Unused image %s was not deleted', name)
+        return False
+    if grace is None:
+        grace = settings.CUSTOM_SETTINGS['IMAGE_REUSE_GRACE']
+    if os.stat(doomed).st_mtime > time() - grace:
+        os.replace(doomed, path)
+        return False
+    try:
+        delete_with_thumbnails(ImageFile(name, post_images), delete_file=False)
+        os.remove(doomed)
+    except OSError:
+        logger.warning('Unused image %s was not deleted', name)
+        return False
+    return True
+
+
+def release(name):
+    """Deletes the blob and its thumbnails once no post refers to it"""
+    transaction.on_commit(lambda: delete_unused(name))
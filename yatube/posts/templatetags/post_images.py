@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(image, placeholder=''):
+    """<picture> with WebP and JPEG variants in several widths, lazily
+    loaded over the inline placeholder"""
+    return {
+        'picture': thumbnails.get_picture(image),
+        'placeholder': placeholder,
+    }
+
+
+@register.simple_tag
+def prefetch_pictures(posts):
+    """Looks the variants of a page of posts up at once"""
+    thumbnails.prefetch_variants(post.image for post in posts)
+    return ''
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.counters import user_stats
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='First group',
+            slug='first',
+            description='First from two'
+        )
+        cls.other_group = Group.objects.create(
+            title='Second group',
+            slug='second',
+            description='Second from two'
+        )
+
+    def assertCounters(self, expected) -> None:
+        for (obj, field), value in expected.items():
+            with self.subTest(obj=obj, field=field):
+                obj.refresh_from_db()
+                self.assertEqual(
+                    getattr(obj, field),
+                    value,
+                    f'!!! - CRUSHED: {field} of {obj}'
+                )
+
+    def test_post_counters(self) -> None:
+        """Creating, moving and deleting posts updates counters"""
+        post = Post.objects.create(
+            author=self.author, text='Counted', group=self.group)
+        stats = user_stats(self.author.id)
+        self.assertCounters({
+            (stats, 'posts_count'): 1,
+            (self.group, 'posts_count'): 1,
+        })
+        post.group = self.other_group
+        post.save()
+        self.assertCounters({
+            (self.group, 'posts_count'): 0,
+            (self.other_group, 'posts_count'): 1,
+        })
+        post.delete()
+        self.assertCounters({
+            (stats, 'posts_count'): 0,
+            (self.other_group, 'posts_count'): 0,
+        })
+
+    def test_comment_counters(self) -> None:
+        """Comments are counted per post"""
+        post = Post.objects.create(author=self.author, text='Discussed')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='First!')
+        Comment.objects.create(post=post, author=self.author, text='Hi')
+        self.assertCounters({(post, 'comments_count'): 2})
+        comment.delete()
+        self.assertCounters({(post, 'comments_count'): 1})
+
+    def test_follow_counters(self) -> None:
+        """Follow updates followers of author and following of user"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author_stats = user_stats(self.author.id)
+        reader_stats = user_stats(self.reader.id)
+        self.assertCounters({
+            (author_stats, 'followers_count'): 1,
+            (reader_stats, 'following_count'): 1,
+        })
+        follow.delete()
+        self.assertCounters({
+            (author_stats, 'followers_count'): 0,
+            (reader_stats, 'following_count'): 0,
+        })
+
+    def test_user_with_posts_can_be_deleted(self) -> None:
+        """Cascade deletion does not resurrect stats of deleted user"""
+        user = User.objects.create_user(username='Leaving')
+        Post.objects.create(author=user, text='Goodbye')
+        Follow.objects.create(user=user, author=self.author)
+        user.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=user.id).exists())
+
+    def test_reconcile_counters_fixes_drift(self) -> None:
+        """reconcile_counters recounts rows created without signals"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Bulk {number}', group=self.group)
+            for number in range(3)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='Bulk comment')
+            for _ in range(2)
+        )
+        UserStats.objects.filter(user=self.author).update(followers_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters({
+            (user_stats(self.author.id), 'posts_count'): 3,
+            (user_stats(self.author.id), 'followers_count'): 0,
+            (user_stats(self.reader.id), 'posts_count'): 0,
+            (self.group, 'posts_count'): 3,
+            (post, 'comments_count'): 2,
+        })
@@ -90,7 +90,7 @@ class PostFormTests(TestCase):
                 group=form_data['group'],
                 author=PostFormTests.user,
                 id=Post.objects.latest('id').id,
-                image='posts/pic.gif'
+                image__regex=r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
             ).exists()
         )
 
@@ -208,10 +208,9 @@ class PostFormTests(TestCase):
         """Test of index_page cache working"""
         index_path = '/'
         response_index_page_1 = self.authorized_client.get(index_path)
-        self.authorized_client.post(
-            reverse('posts:post_create'),
-            {'text': 'Cache cache cache'}
-        )
+        # queryset update sends no signals, so the version stays the same
+        Post.objects.filter(pk=PostFormTests.post.pk).update(
+            text='Cache cache cache')
         response_index_page_2 = self.authorized_client.get(index_path)
         self.assertEqual(
             response_index_page_1.content,
@@ -226,6 +225,18 @@ class PostFormTests(TestCase):
             '!!! - CRUSHED: check cache or cache time'
         )
 
+        # New post bumps posts version and shows up at once
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Fresh post'}
+        )
+        response_index_page_4 = self.authorized_client.get(index_path)
+        self.assertContains(
+            response_index_page_4,
+            'Fresh post',
+            msg_prefix='!!! - CRUSHED: cache is not invalidated'
+        )
+
 
 class TestPostForm(TestCase):
     @classmethod
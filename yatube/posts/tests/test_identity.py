@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import Http404
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.identity import IdentityMap, get_object
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+test_crush = '!!! - CRUSHED: '
+
+
+class IdentityMapTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Mapped post', group=cls.group)
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def post_queries(self, context) -> list:
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and '"posts_post"."text"' in query['sql']
+            and '"posts_post"."id" = ' in query['sql']
+        ]
+
+    def test_same_object_is_loaded_once(self) -> None:
+        """Lookups by pk and natural key hit database once"""
+        identity_map = IdentityMap()
+        with self.assertNumQueries(1):
+            first = identity_map.get(User.objects, username='Author')
+            second = identity_map.get(User.objects, pk=self.user.pk)
+            third = identity_map.get(User.objects, id=self.user.pk)
+        self.assertIs(first, second, f'{test_crush}pk lookup')
+        self.assertIs(first, third, f'{test_crush}id lookup')
+
+    def test_related_objects_are_remembered(self) -> None:
+        """Objects loaded by select_related join the map"""
+        identity_map = IdentityMap()
+        post = identity_map.get(
+            Post.objects.select_related('author', 'group'), pk=self.post.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(
+                identity_map.get(User.objects, pk=self.user.pk),
+                post.author,
+                f'{test_crush}related author'
+            )
+
+    def test_filtered_queryset_is_not_served_unfiltered(self) -> None:
+        """Object cached without filters is checked against them"""
+        identity_map = IdentityMap()
+        identity_map.get(User.objects, username='Author')
+        with self.assertRaises(Http404):
+            identity_map.get(
+                User.objects.filter(is_staff=True), username='Author')
+        with self.assertNumQueries(0):
+            identity_map.get(User.objects, pk=self.user.pk)
+
+    def test_filtered_result_serves_unfiltered_lookups(self) -> None:
+        """Object passing filters is the one found without them"""
+        identity_map = IdentityMap()
+        post = identity_map.get(
+            Post.objects.filter(group=self.group), pk=self.post.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(
+                identity_map.get(Post.objects, pk=self.post.pk), post)
+
+    def test_missing_object_raises_404(self) -> None:
+        """Unknown key is reported as Http404"""
+        request = RequestFactory().get('/')
+        with self.assertRaises(Http404):
+            get_object(request, Group.objects, slug='missing')
+
+    def test_views_fetch_post_once(self) -> None:
+        """Detail, edit and comment views query the post once"""
+        urls = {
+            'post_detail': ('get', {}),
+            'post_edit': ('post', {'text': 'Edited', 'group': ''}),
+            'add_comment': ('post', {'text': 'Comment'}),
+        }
+        for name, (method, data) in urls.items():
+            with self.subTest(view=name):
+                url = reverse(f'posts:{name}', args=[self.post.id])
+                with CaptureQueriesContext(connection) as context:
+                    getattr(self.authorized_client, method)(url, data)
+                self.assertEqual(
+                    len(self.post_queries(context)),
+                    1,
+                    f'{test_crush}post is loaded again in {name}'
+                )
+
+    def test_map_is_cleared_between_requests(self) -> None:
+        """Next request sees changes made after the previous one"""
+        url = reverse('posts:post_edit', args=[self.post.id])
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Changed')
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            response.context['form'].instance.text,
+            'Changed',
+            f'{test_crush}identity map outlived the request'
+        )
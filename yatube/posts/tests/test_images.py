@@ -0,0 +1,218 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.images import normalize
+from posts.models import Post
+from posts.uploads import ImageUploadHandler
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+test_crush = '!!! - CRUSHED: '
+
+max_size = settings.CUSTOM_SETTINGS['IMAGE_MAX_SIZE']
+
+
+def camera_jpeg(name='camera.jpg', size=(3000, 2000)) -> SimpleUploadedFile:
+    """Big high quality JPEG with EXIF like phones upload"""
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=100, exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def xpm_image(name='dots.xpm') -> SimpleUploadedFile:
+    """2x2 XPM, a format Pillow reads but does not write"""
+    return SimpleUploadedFile(name, (
+        b'/* XPM */\n'
+        b'static char *dots[] = {\n'
+        b'"2 2 2 1",\n'
+        b'"  c #000000",\n'
+        b'". c #FFFFFF",\n'
+        b'" .",\n'
+        b'". "\n'
+        b'};\n'
+    ), 'image/x-xpixmap')
+
+
+class NormalizeTests(TestCase):
+    def test_big_image_is_capped_and_stripped(self) -> None:
+        """Dimensions are capped, EXIF dropped, format and name kept"""
+        upload = camera_jpeg()
+        normalized = normalize(upload)
+        image = Image.open(normalized)
+        self.assertLessEqual(image.width, max_size[0])
+        self.assertLessEqual(image.height, max_size[1])
+        self.assertNotIn('exif', image.info, f'{test_crush}metadata kept')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(normalized.name, 'camera.jpg')
+        self.assertLess(normalized.size, upload.size)
+
+    def test_small_clean_image_is_kept(self) -> None:
+        """Re-encoding that gains nothing keeps the upload"""
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG', optimize=True)
+        upload = SimpleUploadedFile('dot.png', buffer.getvalue(), 'image/png')
+        self.assertIs(normalize(upload), upload)
+
+    def test_read_only_format_is_kept(self) -> None:
+        """Format Pillow can not write is stored as uploaded"""
+        upload = xpm_image()
+        self.assertIs(normalize(upload), upload)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostFormNormalizeTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_upload_sizes_are_recorded(self) -> None:
+        """Created post stores normalized image and both byte sizes"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Big picture', 'image': camera_jpeg()}
+        )
+        post = Post.objects.get(text='Big picture')
+        self.assertRegex(post.image.name, r'^posts/\w\w/\w{64}\.jpg$')
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertLess(
+            post.image_size,
+            post.image_original_size,
+            f'{test_crush}stored image is not smaller'
+        )
+        self.assertLessEqual(
+            max(post.image.width, post.image.height), max(max_size))
+
+    def test_placeholder_is_rendered_inline(self) -> None:
+        """Tiny preview is stored at upload and shown under lazy image"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Placeholder', 'image': camera_jpeg()}
+        )
+        post = Post.objects.get(text='Placeholder')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/png;base64,'))
+        self.assertLess(
+            len(post.image_placeholder), 1024,
+            f'{test_crush}placeholder is not tiny'
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, post.image_placeholder)
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_read_only_format_is_accepted(self) -> None:
+        """Upload in a format Pillow can not write is stored unchanged"""
+        upload = xpm_image()
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Pixmap', 'image': upload}
+        )
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(text='Pixmap')
+        self.assertEqual(post.image_size, post.image_original_size)
+        self.assertTrue(post.image.name.endswith('.xpm'))
+
+
+def limits(**custom_settings):
+    return override_settings(
+        CUSTOM_SETTINGS={**settings.CUSTOM_SETTINGS, **custom_settings})
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Huge picture', 'image': camera_jpeg()}
+        )
+
+    @limits(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_big_file_is_a_form_error(self) -> None:
+        """File over the byte limit is refused with a form error"""
+        response = self.create_post()
+        self.assertFormError(
+            response, 'form', 'image',
+            'The file is too big, the limit is 1.0\xa0KB.'
+        )
+        self.assertFalse(Post.objects.filter(text='Huge picture').exists())
+
+    @limits(IMAGE_MAX_PIXELS=10 ** 6)
+    def test_too_many_pixels_is_a_form_error(self) -> None:
+        """Image over the pixel limit is refused from its header"""
+        response = self.create_post()
+        self.assertFormError(
+            response, 'form', 'image',
+            'The image is too large, the limit is 1 megapixels.'
+        )
+        self.assertFalse(Post.objects.filter(text='Huge picture').exists())
+
+    @limits(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_refused_file_stops_the_upload(self) -> None:
+        """Handler stops reading the request once the file is refused"""
+        handler = ImageUploadHandler()
+        handler.new_file('image', 'big.jpg', 'image/jpeg', None)
+        with self.assertRaises(StopUpload) as context:
+            handler.receive_data_chunk(b'x' * 2048, 0)
+        self.assertTrue(context.exception.connection_reset)
+        self.assertTrue(handler.file.closed)
+        self.assertEqual(
+            handler.errors,
+            {'image': 'The file is too big, the limit is 1.0\xa0KB.'}
+        )
+
+    @limits(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_other_views_keep_default_handlers(self) -> None:
+        """Limits apply to post forms only"""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIsInstance(
+            response.wsgi_request.upload_handlers[0], ImageUploadHandler)
+
+    def test_post_form_still_checks_csrf(self) -> None:
+        """Views installing the handler check the token themselves"""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Forged'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.filter(text='Forged').exists())
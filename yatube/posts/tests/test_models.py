@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 
 from posts.models import Group, Post
@@ -88,6 +90,59 @@ class GroupModelTest(TestCase):
         )
 
 
+class GroupSlugTest(TestCase):
+    def slug_selects(self, context) -> int:
+        return sum(
+            query['sql'].startswith('SELECT') and 'posts_group' in query['sql']
+            for query in context.captured_queries
+        )
+
+    def test_colliding_titles_get_suffixes(self) -> None:
+        """Taken slugs get the next free numbered suffix"""
+        slugs = [
+            Group.objects.create(title='Кино', description='-').slug
+            for _ in range(3)
+        ]
+        self.assertEqual(slugs, ['kino', 'kino-2', 'kino-3'])
+
+    def test_free_slug_is_found_with_one_query(self) -> None:
+        """Taken slugs are read at once instead of trying each"""
+        for _ in range(5):
+            Group.objects.create(title='Music', description='-')
+        with CaptureQueriesContext(connection) as context:
+            group = Group.objects.create(title='Music', description='-')
+        self.assertEqual(group.slug, 'music-6')
+        self.assertEqual(self.slug_selects(context), 1)
+
+    def test_saved_group_keeps_its_slug(self) -> None:
+        """Group does not collide with itself on update"""
+        group = Group.objects.create(title='Music', description='-')
+        group.description = 'Changed'
+        group.save()
+        self.assertEqual(group.slug, 'music')
+
+    def test_suffix_fits_max_length(self) -> None:
+        """Suffix replaces the end of a slug of maximal length"""
+        Group.objects.create(title='Ж' * 100, description='-')
+        group = Group.objects.create(title='Ж' * 100, description='-')
+        self.assertEqual(group.slug, 'zh' * 24 + '-2')
+
+    def test_bulk_create_unique(self) -> None:
+        """Batch gets slugs free in the table and within the batch"""
+        Group.objects.create(title='Music', description='-')
+        groups = [
+            Group(title=title, description='-')
+            for title in ('Music', 'Music', 'Кино', 'Кино')
+        ]
+        with CaptureQueriesContext(connection) as context:
+            Group.bulk_create_unique(groups)
+        self.assertEqual(self.slug_selects(context), 1)
+        self.assertEqual(
+            sorted(Group.objects.values_list('slug', flat=True)),
+            ['kino', 'kino-2', 'music', 'music-2', 'music-3']
+        )
+
+
 class PostModelTest(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
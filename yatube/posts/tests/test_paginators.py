@@ -0,0 +1,202 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+from posts.paginators import CursorPaginator, WindowedPaginator
+
+
+User = get_user_model()
+
+posts_per_page = settings.CUSTOM_SETTINGS['POSTS_PER_PAGE']
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Terminator')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test group description'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Text for post {number}', author=cls.user,
+                 group=cls.group)
+            for number in range(posts_per_page * 2 + 3)
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+        ]
+        self.expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def walk(self, url, cursor_name):
+        """Follows cursor links from the first page until the end"""
+        visited, pages = [], []
+        response = self.client.get(url, {'cursor': ''})
+        while True:
+            page = response.context['page_obj']
+            pages.append(page)
+            visited.extend(post.id for post in page)
+            cursor = getattr(page, cursor_name)
+            if not cursor:
+                return visited, pages
+            response = self.client.get(url, {'cursor': cursor})
+
+    def test_cursor_pages_cover_all_posts_in_order(self) -> None:
+        """Next links walk through every post exactly once"""
+        for url in self.pages:
+            with self.subTest(url=url):
+                visited, pages = self.walk(url, 'next_cursor')
+                self.assertEqual(
+                    visited,
+                    self.expected,
+                    f'!!! - CRUSHED: cursor pages of {url}'
+                )
+                self.assertEqual(len(pages), 3)
+                self.assertFalse(pages[0].has_previous())
+                self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursor_returns_previous_page(self) -> None:
+        """Previous link brings back the same posts"""
+        url = reverse('posts:index')
+        first = self.client.get(url, {'cursor': ''}).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertEqual(back.next_cursor, first.next_cursor)
+
+    def test_cursor_pages_do_not_count_rows(self) -> None:
+        """Deep cursor page runs no COUNT(*) query"""
+        paginator = CursorPaginator(Post.objects.all(), posts_per_page)
+        cursor = paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.page(cursor)
+        self.assertEqual(
+            [post.id for post in page],
+            self.expected[posts_per_page:posts_per_page * 2]
+        )
+
+    def test_numbered_pages_by_default(self) -> None:
+        """Cursor pagination is opt-in, plain listings are numbered"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.context['cursor_mode'])
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            response.context['page_window'], [1, 2, 3])
+        response = self.client.get(reverse('posts:index'), {'cursor': ''})
+        self.assertTrue(response.context['cursor_mode'])
+
+    def test_page_number_links_still_work(self) -> None:
+        """Old ?page=N links are served by offset pagination"""
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected[posts_per_page * 2:]
+        )
+
+    def test_broken_cursor_returns_404(self) -> None:
+        """Garbage in ?cursor= is treated as missing page"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND.value)
+
+
+class WindowedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Terminator')
+        Post.objects.bulk_create(
+            Post(text=f'Text for post {number}', author=cls.user)
+            for number in range(95)
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_page_window_shows_neighbours_and_ends(self) -> None:
+        """Only pages around the current one plus first and last"""
+        paginator = WindowedPaginator(Post.objects.all(), 1, count=100)
+        windows = {
+            1: [1, 2, 3, None, 100],
+            5: [1, 2, 3, 4, 5, 6, 7, None, 100],
+            50: [1, None, 48, 49, 50, 51, 52, None, 100],
+            100: [1, None, 98, 99, 100],
+        }
+        for number, expected in windows.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    paginator.get_page_window(number), expected)
+
+    def test_count_is_shared_through_cache(self) -> None:
+        """Second paginator over the same query does not count again"""
+        WindowedPaginator(Post.objects.all(), 10).page(2)
+        with self.assertNumQueries(1):
+            page = WindowedPaginator(Post.objects.all(), 10).page(2)
+        self.assertEqual(page.paginator.num_pages, 10)
+
+    def test_last_page_corrects_estimate(self) -> None:
+        """Wrong stored count does not hide existing pages"""
+        paginator = WindowedPaginator(Post.objects.all(), 10, count=0)
+        with self.assertNumQueries(1):
+            page = paginator.page(10)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.count, 95)
+        self.assertFalse(page.has_next())
+
+    def test_page_window_in_context(self) -> None:
+        """Template gets the window instead of the full page range"""
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            {'page': 5}
+        )
+        self.assertEqual(
+            response.context['page_window'],
+            [1, 2, 3, 4, 5, 6, 7, None, 10]
+        )
+
+    def test_follow_feed_count_follows_unfollow(self) -> None:
+        """Unfollowing drops the cached count of the follow feed"""
+        reader = User.objects.create_user(username='Reader')
+        other = User.objects.create_user(username='Other')
+        Post.objects.bulk_create(
+            Post(text=f'Other post {number}', author=other)
+            for number in range(posts_per_page * 2 + 3)
+        )
+        Follow.objects.create(user=reader, author=self.user)
+        Follow.objects.create(user=reader, author=other)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        count = client.get(url).context['paginator'].count
+        self.assertEqual(count, 95 + posts_per_page * 2 + 3)
+        client.get(reverse('posts:profile_unfollow',
+                           kwargs={'username': self.user.username}))
+        self.assertEqual(
+            client.get(url).context['paginator'].count,
+            posts_per_page * 2 + 3,
+            '!!! - CRUSHED: stale count after unfollow'
+        )
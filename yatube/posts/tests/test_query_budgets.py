@@ -0,0 +1,202 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.middleware import QueryBudgetExceeded
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+test_crush = '!!! - CRUSHED: '
+
+budgets = settings.CUSTOM_SETTINGS['QUERY_BUDGETS']
+
+
+class QueryBudgetMixin:
+    """Assertions on number of queries made by one request"""
+    def count_queries(self, client, url, method='get', data=None) -> int:
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            getattr(client, method)(url, data)
+        return len(context.captured_queries)
+
+    def assertQueryBudget(self, client, view_name, args=(), method='get',
+                          data=None) -> int:
+        """Request stays within budget of its URL name"""
+        count = self.count_queries(
+            client, reverse(view_name, args=args), method, data)
+        self.assertLessEqual(
+            count,
+            budgets[view_name],
+            f'{test_crush}{view_name} is over query budget'
+        )
+        return count
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    data_sizes = (1, 4, 12)
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.fan = User.objects.create_user(username='Fan')
+        cls.group = Group.objects.create(title='Group', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        # every listing has more than one numbered page from the start
+        for _ in range(settings.CUSTOM_SETTINGS['POSTS_PER_PAGE']):
+            Post.objects.create(
+                author=cls.author, text='Filler post', group=cls.group)
+
+    def setUp(self) -> None:
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.fan_client = Client()
+        self.fan_client.force_login(self.fan)
+
+    def grow(self, size) -> Post:
+        """Adds posts with images and comments up to the given size"""
+        budget_posts = Post.objects.exclude(text='Filler post')
+        while budget_posts.count() < size:
+            count = budget_posts.count()
+            post = Post.objects.create(
+                author=User.objects.create_user(username=f'Writer{count}'),
+                text='Budget post',
+                group=self.group,
+                image=f'posts/budget{count}.gif'
+            )
+            Follow.objects.create(user=self.reader, author=post.author)
+            Post.objects.create(
+                author=self.author,
+                text='Author post',
+                group=self.group,
+                image=f'posts/budget{count}.gif'
+            )
+        post = Post.objects.filter(author=self.author).first()
+        while post.comments.count() < size:
+            Comment.objects.create(
+                post=post,
+                author=User.objects.create_user(
+                    username=f'Reader{Comment.objects.count()}'),
+                text='Budget comment'
+            )
+        return post
+
+    def requests(self, post) -> dict:
+        return {
+            'posts:index': (self.client, ()),
+            'posts:group_list': (self.client, (self.group.slug,)),
+            'posts:profile': (self.reader_client, (self.author.username,)),
+            'posts:post_detail': (self.reader_client, (post.id,)),
+            'posts:post_edit': (self.author_client, (post.id,)),
+            'posts:post_create': (self.author_client, ()),
+            'posts:follow_index': (self.reader_client, ()),
+        }
+
+    def test_views_stay_within_budget(self) -> None:
+        """Number of queries does not grow with number of rows"""
+        counts = {}
+        for size in self.data_sizes:
+            post = self.grow(size)
+            for view_name, (client, args) in self.requests(post).items():
+                with self.subTest(view=view_name, size=size):
+                    count = self.assertQueryBudget(client, view_name, args)
+                    self.assertEqual(
+                        count,
+                        counts.setdefault(view_name, count),
+                        f'{test_crush}{view_name} has N+1 queries'
+                    )
+
+    def writes(self, post) -> dict:
+        return {
+            'posts:add_comment': (self.reader_client, (post.id,),
+                                  {'text': 'Comment'}),
+            'posts:post_edit': (self.author_client, (post.id,),
+                                {'text': 'Edited', 'group': ''}),
+            'posts:post_create': (self.author_client, (),
+                                  {'text': 'Created'}),
+            # the followed author has more posts on every size
+            'posts:profile_follow': (self.fan_client,
+                                     (self.author.username,), None),
+            'posts:profile_unfollow': (self.fan_client,
+                                       (self.author.username,), None),
+        }
+
+    def assertWritesConstant(self, post, size, counts) -> None:
+        for view_name, (client, args, data) in self.writes(post).items():
+            with self.subTest(view=view_name, size=size):
+                count = self.assertQueryBudget(
+                    client, view_name, args,
+                    method='post' if data else 'get',
+                    data=data
+                )
+                self.assertEqual(
+                    count,
+                    counts.setdefault(view_name, count),
+                    f'{test_crush}{view_name} has N+1 queries'
+                )
+
+    def test_write_views_stay_within_budget(self) -> None:
+        """Posting forms and follows do not grow with number of rows"""
+        counts = {}
+        for size in self.data_sizes:
+            post = self.grow(size)
+            self.assertWritesConstant(post, size, counts)
+        # more posts than one insert batch of the timeline
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Bulk post')
+            for _ in range(timeline.BATCH_SIZE + 1)
+        )
+        post = Post.objects.create(
+            author=self.author, text='Author post', group=self.group)
+        self.assertWritesConstant(post, timeline.BATCH_SIZE, counts)
+
+    @override_settings(CUSTOM_SETTINGS={
+        **settings.CUSTOM_SETTINGS,
+        'QUERY_BUDGETS': {'posts:index': 0},
+        'QUERY_BUDGET_MODE': 'raise',
+    })
+    def test_request_over_budget_is_rejected(self) -> None:
+        """Middleware rejects request over budget in raise mode"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    @override_settings(CUSTOM_SETTINGS={
+        **settings.CUSTOM_SETTINGS,
+        'QUERY_BUDGETS': {'posts:index': 0},
+        'QUERY_BUDGET_MODE': 'log',
+    })
+    def test_request_over_budget_is_logged(self) -> None:
+        """Middleware logs request over budget in log mode"""
+        with self.assertLogs('posts.middleware', 'WARNING'):
+            self.client.get(reverse('posts:index'))
+
+
+class ExplainQueriesTests(TestCase):
+    def test_listing_queries_use_indexes(self) -> None:
+        """explain_queries finds no full scans or sorts"""
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        group = Group.objects.create(title='Group', slug='group')
+        Post.objects.create(author=author, text='Indexed', group=group)
+        Follow.objects.create(user=reader, author=author)
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertNotIn('FAIL', out.getvalue(), f'{test_crush}query plan')
+
+    def test_empty_database_is_reported(self) -> None:
+        """Command asks for data instead of explaining nothing"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
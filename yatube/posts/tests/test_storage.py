@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import delete_unused, post_images
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+test_crush = '!!! - CRUSHED: '
+
+small_gif = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CUSTOM_SETTINGS={
+        **settings.CUSTOM_SETTINGS,
+        'THUMBNAIL_WORKERS': 0,
+        'IMAGE_REUSE_GRACE': 0,
+    },
+)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        # records of images rolled back by other tests stay in the LRU
+        thumbnails.default.kvstore.cache_clear()
+        self.user = User.objects.create_user(username='Reposter')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def make_post(self, name='pic.gif', content=small_gif) -> Post:
+        return Post.objects.create(
+            author=self.user,
+            text='Reposted picture',
+            image=SimpleUploadedFile(name, content, 'image/gif')
+        )
+
+    def blob_exists(self, post) -> bool:
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, post.image.name))
+
+    def test_equal_images_share_one_blob(self) -> None:
+        """Same picture under other name is stored once"""
+        first = self.make_post('pic.gif')
+        second = self.make_post('copy.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(
+            os.path.join(TEMP_MEDIA_ROOT, first.image.name))
+        self.assertEqual(
+            len(os.listdir(directory)), 1, f'{test_crush}blob stored twice')
+
+    def test_blob_is_deleted_with_last_post(self) -> None:
+        """Blob lives while at least one post refers to it"""
+        first = self.make_post()
+        second = self.make_post()
+        first.delete()
+        self.assertTrue(self.blob_exists(second), f'{test_crush}blob lost')
+        second.delete()
+        self.assertFalse(self.blob_exists(second), f'{test_crush}blob left')
+
+    def test_replaced_image_is_released(self) -> None:
+        """Editing the image releases the old blob"""
+        post = self.make_post()
+        old = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile(
+            'other.gif', small_gif + b'\x00', 'image/gif')
+        post.save()
+        self.assertNotEqual(old.image.name, post.image.name)
+        self.assertFalse(self.blob_exists(old), f'{test_crush}old blob left')
+
+    def test_reused_blob_is_not_deleted(self) -> None:
+        """Blob reused by a post not committed yet survives the release"""
+        post = self.make_post()
+        Post.objects.filter(pk=post.pk).delete()
+        post_images.save('posts/again.gif', SimpleUploadedFile(
+            'again.gif', small_gif, 'image/gif'))
+        with self.settings(CUSTOM_SETTINGS={
+            **settings.CUSTOM_SETTINGS, 'IMAGE_REUSE_GRACE': 60,
+        }):
+            self.assertFalse(delete_unused(post.image.name))
+        self.assertTrue(self.blob_exists(post), f'{test_crush}blob lost')
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(TEMP_MEDIA_ROOT, post.image.name + '.deleted')),
+            f'{test_crush}blob left aside'
+        )
+
+    def test_blob_deleted_meanwhile_is_written_again(self) -> None:
+        """Saving a blob just deleted stores it again"""
+        post = self.make_post()
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, post.image.name))
+        name = post_images.save('posts/again.gif', SimpleUploadedFile(
+            'again.gif', small_gif, 'image/gif'))
+        self.assertEqual(name, post.image.name)
+        self.assertTrue(self.blob_exists(post), f'{test_crush}blob lost')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CUSTOM_SETTINGS={**settings.CUSTOM_SETTINGS, 'THUMBNAIL_WORKERS': 0},
+)
+class CollectMediaTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        thumbnails.default.kvstore.cache_clear()
+        user = User.objects.create_user(username='Collector')
+        self.post = Post.objects.create(
+            author=user,
+            text='Kept picture',
+            image=SimpleUploadedFile('pic.gif', small_gif, 'image/gif')
+        )
+        thumbnails.enqueue(self.post.image.name)
+        self.kept = [self.post.image.name] + [
+            thumbnail.name for thumbnail in
+            thumbnails.get_stored_variants(self.post.image).values()
+        ]
+        self.orphans = ['posts/00/lost.gif', 'posts/lost.gif', 'cache/0/x.jpg']
+        for name in self.orphans:
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(small_gif)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def exists(self, name) -> bool:
+        return os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+
+    def collect(self, **options) -> str:
+        out = StringIO()
+        call_command(
+            'collect_media', rate=0, batch_size=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_deletes_nothing(self) -> None:
+        """Dry run lists orphans and keeps every file"""
+        out = self.collect(min_age=0, dry_run=True)
+        for name in self.orphans:
+            self.assertIn(f'Would delete {name}', out)
+            self.assertTrue(self.exists(name))
+        self.assertIn('2 orphaned images and 1 stale thumbnails', out)
+
+    def test_orphans_are_deleted(self) -> None:
+        """Orphans go, the post image and its thumbnails stay"""
+        self.collect(min_age=0)
+        for name in self.orphans:
+            self.assertFalse(self.exists(name), f'{test_crush}{name} left')
+        for name in self.kept:
+            self.assertTrue(self.exists(name), f'{test_crush}{name} lost')
+
+    def test_recent_files_are_kept(self) -> None:
+        """Files younger than min age may belong to posts being saved"""
+        self.assertIn('Deleted 0 orphaned images', self.collect())
+        for name in self.orphans:
+            self.assertTrue(self.exists(name))
@@ -0,0 +1,289 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import storage, thumbnails
+from posts.models import Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+test_crush = '!!! - CRUSHED: '
+
+small_gif = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+inline_workers = override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CUSTOM_SETTINGS={**settings.CUSTOM_SETTINGS, 'THUMBNAIL_WORKERS': 0},
+)
+
+
+def make_post(author) -> Post:
+    return Post.objects.create(
+        author=author,
+        text='Post with picture',
+        image=SimpleUploadedFile(
+            'pic.gif', small_gif, content_type='image/gif')
+    )
+
+
+@inline_workers
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        # records of images rolled back by other tests stay in the LRU
+        thumbnails.default.kvstore.cache_clear()
+        self.post = make_post(self.user)
+
+    def test_original_is_shown_until_thumbnail_exists(self) -> None:
+        """Request does not generate thumbnail, original is shown"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertEqual(
+            thumbnails.get_stored_variants(self.post.image), {},
+            f'{test_crush}thumbnail made inside request'
+        )
+
+    def test_generated_thumbnail_is_shown(self) -> None:
+        """After the worker run templates use the thumbnail"""
+        thumbnails.enqueue(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_cached_pages_get_thumbnails_once_ready(self) -> None:
+        """Storing the last variant refreshes cached pages"""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        ]
+        for url in pages:
+            self.assertContains(self.client.get(url), self.post.image.url)
+        thumbnails.enqueue(self.post.image.name)
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.client.get(url), self.post.image.url)
+
+    def test_picture_offers_all_variants(self) -> None:
+        """<picture> lists WebP and JPEG variants of every width"""
+        thumbnails.enqueue(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<source type="image/webp"')
+        content = response.content.decode()
+        for width in thumbnails.VARIANT_WIDTHS:
+            self.assertEqual(
+                content.count(f' {width}w'), 2,
+                f'{test_crush}variants of width {width} are not offered'
+            )
+        self.assertIn('.webp', content)
+
+    def test_picture_uses_ready_variants_only(self) -> None:
+        """Variants which are not made yet are left out of srcset"""
+        thumbnails.generate(self.post.image.name, '320x113', 'WEBP')
+        picture = thumbnails.get_picture(self.post.image)
+        self.assertEqual(len(picture['sources']), 1)
+        self.assertTrue(picture['sources'][0]['srcset'].endswith(' 320w'))
+        self.assertEqual(picture['src'], self.post.image.url)
+        self.assertEqual(picture['srcset'], '')
+
+    def test_post_without_image_has_no_thumbnail(self) -> None:
+        """Empty image gives nothing to render"""
+        post = Post.objects.create(author=self.user, text='No picture')
+        self.assertIsNone(thumbnails.get_picture(post.image))
+
+
+@inline_workers
+class ThumbnailQueueTests(TransactionTestCase):
+    def setUp(self) -> None:
+        thumbnails.default.kvstore.cache_clear()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cache.clear()
+
+    def test_thumbnails_are_queued_on_save(self) -> None:
+        """Committed post with image gets its thumbnails"""
+        post = make_post(User.objects.create_user(username='Author'))
+        self.assertEqual(
+            len(thumbnails.get_stored_variants(post.image)),
+            len(thumbnails.VARIANTS),
+            f'{test_crush}thumbnails were not generated on save'
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CUSTOM_SETTINGS={**settings.CUSTOM_SETTINGS, 'THUMBNAIL_WORKERS': 2},
+)
+class ThumbnailPoolTests(TransactionTestCase):
+    def setUp(self) -> None:
+        thumbnails.default.kvstore.cache_clear()
+
+    def tearDown(self) -> None:
+        thumbnails.shutdown()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cache.clear()
+
+    def test_pool_makes_all_variants(self) -> None:
+        """Background threads store every variant of a saved image"""
+        post = make_post(User.objects.create_user(username='Author'))
+        thumbnails.shutdown()
+        self.assertEqual(
+            len(thumbnails.get_stored_variants(post.image)),
+            len(thumbnails.VARIANTS),
+            f'{test_crush}pool did not make the variants'
+        )
+
+
+@inline_workers
+class WarmupCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        thumbnails.default.kvstore.cache_clear()
+
+    def warmup(self, **options) -> str:
+        out = StringIO()
+        call_command(
+            'warmup_thumbnails', processes=0, stdout=out, stderr=StringIO(),
+            **options)
+        return out.getvalue()
+
+    def test_missing_variants_are_made_once(self) -> None:
+        """All variants are made, the second run has nothing to do"""
+        post = make_post(self.user)
+        make_post(self.user)
+        self.assertIn(
+            f'Warmed 1 images, made {len(thumbnails.VARIANTS)} thumbnails',
+            self.warmup()
+        )
+        self.assertEqual(
+            len(thumbnails.get_stored_variants(post.image)),
+            len(thumbnails.VARIANTS)
+        )
+        self.assertIn('made 0 thumbnails', self.warmup())
+
+    def test_resume_and_recent_posts(self) -> None:
+        """--after skips done posts and --days skips old ones"""
+        post = make_post(self.user)
+        self.assertIn('Warmed 0 images', self.warmup(after=post.pk))
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        self.assertIn('Warmed 0 images', self.warmup(days=7))
+        self.assertIn('Warmed 1 images', self.warmup(days=31))
+
+    def test_failed_thumbnails_are_reported(self) -> None:
+        """Missing source file fails the command"""
+        Post.objects.create(
+            author=self.user, text='Lost picture', image='posts/lost.gif')
+        with self.assertRaisesMessage(
+            CommandError,
+            f'{len(thumbnails.VARIANTS)} thumbnails failed'
+        ):
+            self.warmup()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CUSTOM_SETTINGS={
+        **settings.CUSTOM_SETTINGS,
+        'THUMBNAIL_WORKERS': 0,
+        'THUMBNAIL_LRU_SIZE': 8,
+        'IMAGE_REUSE_GRACE': 0,
+    },
+)
+class LRUKVStoreTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.kvstore = thumbnails.default.kvstore
+        self.kvstore.cache_clear()
+        self.post = make_post(self.user)
+
+    def tearDown(self) -> None:
+        self.kvstore.cache_clear()
+
+    def test_repeated_lookups_stay_in_process(self) -> None:
+        """Second lookup needs neither database nor cache"""
+        thumbnails.get_stored_variants(self.post.image)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            thumbnails.get_stored_variants(self.post.image)
+        self.assertEqual(len(context.captured_queries), 0)
+        info = self.kvstore.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_size_is_bounded(self) -> None:
+        """Least recently used entries are evicted"""
+        for number in range(20):
+            self.kvstore._get(f'missing{number}')
+        info = self.kvstore.cache_info()
+        self.assertEqual(info.currsize, info.maxsize)
+        self.kvstore._get('missing19')
+        self.kvstore._get('missing0')
+        info = self.kvstore.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 21))
+
+    def test_released_image_is_forgotten(self) -> None:
+        """Changing the image drops variants of the old one"""
+        thumbnails.enqueue(self.post.image.name)
+        old = Post.objects.get(pk=self.post.pk).image
+        self.assertEqual(
+            len(thumbnails.get_stored_variants(old)),
+            len(thumbnails.VARIANTS)
+        )
+        self.post.image = SimpleUploadedFile(
+            'other.gif', small_gif + b'\x00', content_type='image/gif')
+        self.post.save()
+        storage.delete_unused(old.name)
+        self.assertEqual(thumbnails.get_stored_variants(old), {})
@@ -0,0 +1,216 @@
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, UserStats
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.stranger = User.objects.create_user(username='Stranger')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Published before follow')
+        Post.objects.create(author=cls.stranger, text='Nobody follows me')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self) -> None:
+        """Following an author brings his old posts into the feed"""
+        self.reader_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_is_pushed_to_followers(self) -> None:
+        """Post created by the author appears in follower timeline"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Fresh news'})
+        new_post = Post.objects.get(text='Fresh news')
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=new_post).exists(),
+            '!!! - CRUSHED: post was not pushed to the follower'
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self) -> None:
+        """Unfollowing removes author posts from the feed"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_rebuild_command_restores_timelines(self) -> None:
+        """rebuild_timelines recreates entries from Follow rows"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.reader.id, self.old_post.id)]
+        )
+
+    def test_popular_author_posts_are_pulled(self) -> None:
+        """Posts of authors over the threshold are read, not pushed"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        custom_settings = dict(
+            settings.CUSTOM_SETTINGS, FEED_PUSH_MAX_FOLLOWERS=2)
+        with override_settings(CUSTOM_SETTINGS=custom_settings):
+            new_post = Post.objects.create(
+                author=self.author, text='Too many readers to push')
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=new_post).exists(),
+                '!!! - CRUSHED: post of popular author was pushed'
+            )
+            self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_pulled_posts_pushed_when_author_drops_below(self) -> None:
+        """Posts from the pulled period reach timelines after unfollow"""
+        custom_settings = dict(
+            settings.CUSTOM_SETTINGS, FEED_PUSH_MAX_FOLLOWERS=2)
+        with override_settings(CUSTOM_SETTINGS=custom_settings):
+            Follow.objects.create(user=self.reader, author=self.author)
+            Follow.objects.create(user=self.stranger, author=self.author)
+            pulled_post = Post.objects.create(
+                author=self.author, text='Written while pulled')
+            Follow.objects.get(
+                user=self.stranger, author=self.author).delete()
+            self.assertTrue(
+                TimelineEntry.objects.filter(
+                    user=self.reader, post=pulled_post).exists(),
+                '!!! - CRUSHED: pulled post was not pushed back'
+            )
+            self.assertEqual(self.feed(), [pulled_post, self.old_post])
+
+    def test_author_pushed_in_one_query(self) -> None:
+        """Pushing an author back costs the same for any followers"""
+        for number in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'Fan{number}'),
+                author=self.author
+            )
+        TimelineEntry.objects.all().delete()
+        with self.assertNumQueries(1):
+            timeline.push_author(self.author.id)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=self.old_post).count(), 5)
+
+
+class TimelineDeletionTests(TransactionTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.stranger = User.objects.create_user(username='Stranger')
+        Post.objects.create(author=self.author, text='Followed post')
+
+    def test_followed_user_can_be_deleted(self) -> None:
+        """Cascade deletion does not resurrect stats of followed user"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author.delete()
+        self.assertFalse(
+            UserStats.objects.filter(user_id=self.author.id).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_pulled_user_can_be_deleted(self) -> None:
+        """Author dropping below the threshold while deleted is not pushed"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        custom_settings = dict(
+            settings.CUSTOM_SETTINGS, FEED_PUSH_MAX_FOLLOWERS=2)
+        with override_settings(CUSTOM_SETTINGS=custom_settings):
+            self.assertTrue(timeline.is_pulled(self.author.id))
+            self.author.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+
+
+class MergedFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.celebrity = User.objects.create_user(username='Celebrity')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        for number in range(settings.CUSTOM_SETTINGS['POSTS_PER_PAGE'] + 3):
+            for author in (cls.author, cls.celebrity):
+                Post.objects.create(author=author, text=f'Post {number}')
+        cls.expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(self.reader)
+        # every followed pulled author costs a query of his own
+        self.custom_settings = dict(
+            settings.CUSTOM_SETTINGS,
+            FEED_PUSH_MAX_FOLLOWERS=1,
+            QUERY_BUDGET_MODE='log',
+        )
+
+    def visit(self, data_name, link):
+        """Post ids of all pages reached by following the links"""
+        url = reverse('posts:follow_index')
+        data, visited = {data_name: link(None)}, []
+        while True:
+            page = self.client.get(url, data).context['page_obj']
+            visited.extend(post.id for post in page)
+            if not page.has_next():
+                return visited
+            data = {data_name: link(page)}
+
+    def test_pages_merge_pushed_and_pulled(self) -> None:
+        """Cursor and numbered pages of a merged feed keep the order"""
+        links = {
+            'cursor': lambda page: page.next_cursor if page else '',
+            'page': lambda page: page.next_page_number() if page else 1,
+        }
+        with override_settings(CUSTOM_SETTINGS=self.custom_settings):
+            feed = timeline.feed(self.reader.id)
+            self.assertIsInstance(feed, timeline.MergedFeed)
+            self.assertEqual(feed.count(), len(self.expected))
+            for data_name, link in links.items():
+                with self.subTest(data_name=data_name):
+                    self.assertEqual(
+                        self.visit(data_name, link),
+                        self.expected,
+                        f'!!! - CRUSHED: {data_name} pages of merged feed'
+                    )
+
+    def test_parts_are_ordered_by_index(self) -> None:
+        """Each part of a merged feed is a separate LIMIT query"""
+        with override_settings(CUSTOM_SETTINGS=self.custom_settings):
+            feed = timeline.feed(self.reader.id)
+            with self.assertNumQueries(len(feed.querysets)):
+                posts = feed[:3]
+        self.assertEqual([post.id for post in posts], self.expected[:3])
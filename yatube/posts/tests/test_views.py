@@ -5,6 +5,7 @@ import tempfile
 from http import HTTPStatus
 
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
@@ -12,7 +13,8 @@ from django.urls import reverse
 from django.utils import timezone
 from django import forms
 
-from posts.models import Follow, Group, Post, User
+from posts import versions
+from posts.models import Comment, Follow, Group, Post, User
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -534,3 +536,180 @@ class PostsPagesTests(TestCase):
             check_follow_2.context['page_obj'].object_list,
             test_crush + 'post from unfollowing author finded'
         )
+
+
+class IndexCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Terminator')
+        Post.objects.bulk_create(
+            Post(text=f'Text for post {number}', author=cls.user)
+            for number in range(posts_per_page + 1)
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_new_post_is_visible_at_once(self) -> None:
+        """Creating a post invalidates cached index page"""
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Brand new post')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Brand new post')
+
+    def test_deleted_post_disappears_at_once(self) -> None:
+        """Deleting a post invalidates cached index page"""
+        post = Post.objects.create(author=self.user, text='Short living')
+        self.client.get(reverse('posts:index'))
+        post.delete()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Short living')
+
+    def test_pages_are_cached_separately(self) -> None:
+        """Second page is not served from the first page cache"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertContains(response, 'Text for post 0')
+        self.assertNotContains(
+            response, f'Text for post {posts_per_page}<')
+
+    def test_auth_state_is_cached_separately(self) -> None:
+        """Guest cache does not hide switcher from logged in user"""
+        self.client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:follow_index'))
+
+
+class VersionedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Cached group',
+            slug='cached',
+            description='Cached group'
+        )
+        cls.other_group = Group.objects.create(
+            title='Other group',
+            slug='other',
+            description='Other group'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Cached post', group=cls.group)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def assertBumped(self, scopes, action) -> None:
+        before = {scope: versions.get_version(*scope) for scope in scopes}
+        action()
+        for scope, expected in scopes.items():
+            with self.subTest(scope=scope):
+                self.assertEqual(
+                    before[scope] != versions.get_version(*scope),
+                    expected,
+                    f'{test_crush}version of {scope}'
+                )
+
+    def test_writes_bump_only_affected_namespaces(self) -> None:
+        """Post, Comment and Follow bump only their own namespaces"""
+        scopes = {
+            'post': (versions.POST, self.post.id),
+            'author': (versions.AUTHOR, self.author.username),
+            'reader': (versions.AUTHOR, self.reader.username),
+            'group': (versions.GROUP, self.group.slug),
+            'other_group': (versions.GROUP, self.other_group.slug),
+        }
+        cases = {
+            'comment': (
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.reader, text='Hi'),
+                {'post'},
+            ),
+            'follow': (
+                lambda: Follow.objects.create(
+                    user=self.reader, author=self.author),
+                {'author'},
+            ),
+            'post': (
+                lambda: Post.objects.create(
+                    author=self.reader, text='New', group=self.other_group),
+                {'reader', 'other_group'},
+            ),
+        }
+        for case, (action, bumped) in cases.items():
+            with self.subTest(case=case):
+                self.assertBumped(
+                    {scope: name in bumped
+                     for name, scope in scopes.items()},
+                    action
+                )
+
+    def test_moved_post_bumps_both_groups(self) -> None:
+        """Moving a post to other group invalidates both groups"""
+        def move():
+            self.post.group = self.other_group
+            self.post.save()
+        self.assertBumped({
+            (versions.GROUP, self.group.slug): True,
+            (versions.GROUP, self.other_group.slug): True,
+            (versions.POST, self.post.id): True,
+        }, move)
+
+    def test_renamed_group_refreshes_profile(self) -> None:
+        """Profile links follow the new slug of a renamed group"""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.client.get(url)
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertContains(
+            self.client.get(url),
+            reverse('posts:group_list', args=['renamed'])
+        )
+
+    def test_pages_are_served_from_cache(self) -> None:
+        """Pages stay cached until something they show is changed"""
+        pages = {
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'detail': reverse('posts:post_detail', args=[self.post.id]),
+        }
+        for name, url in pages.items():
+            with self.subTest(page=name):
+                shown = self.post.text
+                self.client.get(url)
+                changed = f'Silently changed for {name}'
+                Post.objects.filter(pk=self.post.pk).update(text=changed)
+                self.assertContains(self.client.get(url), shown)
+                self.post.refresh_from_db()
+                self.post.save()
+                self.assertContains(self.client.get(url), changed)
+
+    def test_new_comment_is_visible_at_once(self) -> None:
+        """Comment invalidates cached post page"""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Fresh comment')
+        self.assertContains(self.client.get(url), 'Fresh comment')
+
+    def test_follow_updates_cached_profile(self) -> None:
+        """Follow invalidates cached followers count of the author"""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(url), 'Followers: 1')
+
+    def test_deleted_group_updates_author_profile(self) -> None:
+        """Deleting a group invalidates profiles of its authors"""
+        group = Group.objects.create(title='Short', slug='short')
+        Post.objects.create(author=self.reader, text='Moved', group=group)
+        url = reverse('posts:profile', args=[self.reader.username])
+        self.assertContains(self.client.get(url), group.slug)
+        group.delete()
+        self.assertNotContains(self.client.get(url), '/group/short/')
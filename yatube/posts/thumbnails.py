@@ -0,0 +1,253 @@
+"""Post thumbnails generated in the background instead of in requests.
+
+Saving a post with a new image queues every variant used by the
+templates into a local thread pool. Variants are the card geometry in
+a few widths, each in WebP and JPEG, which templates offer through
+srcset so small screens download small files. Templates only look
+thumbnails up in the sorl key value store and show the original image
+until the worker has stored them. Storing the last variant bumps the
+cache versions of the posts showing the image, so cached pages stop
+sending the original.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import versions
+from .models import Post
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+# widths offered to browsers, the height keeps the 960x339 card ratio
+VARIANT_WIDTHS = (320, 640, 960)
+# formats in order of preference, DEFAULT_FORMAT is the <img> fallback
+VARIANT_FORMATS = ('WEBP', 'JPEG')
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+# rendered width of the post card
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+GEOMETRIES = {
+    f'{width}x{round(width * 339 / 960)}': {
+        'crop': 'center', 'upscale': True}
+    for width in VARIANT_WIDTHS
+}
+DEFAULT_GEOMETRY = '960x339'
+DEFAULT_FORMAT = 'JPEG'
+VARIANTS = [
+    (geometry, image_format)
+    for image_format in VARIANT_FORMATS for geometry in GEOMETRIES
+]
+
+_executor = None
+_queued = set()
+_lock = threading.Lock()
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """sorl backend which can look a thumbnail up without creating it"""
+    def get_options(self, source, options):
+        """Options completed the same way get_thumbnail() does it"""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail_file(self, source, geometry_string, **options):
+        """Not yet checked file the thumbnail is or would be stored in"""
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.get_options(source, options))
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnails(self, file_, variants):
+        """Stored thumbnails of the variants, found with a single lookup.
+
+        sorl lists the thumbnail keys of every source, so one read of
+        that list tells which variants exist without a lookup each.
+        Stores which do not expose the list are asked variant by variant.
+        """
+        source = ImageFile(file_)
+        kvstore = default.kvstore
+        stored = None
+        if hasattr(kvstore, 'get_thumbnail_keys'):
+            stored = kvstore.get_thumbnail_keys(source)
+        found = {}
+        for variant, (geometry, options) in variants.items():
+            thumbnail = self.get_thumbnail_file(source, geometry, **options)
+            if stored is None:
+                is_stored = kvstore.get(thumbnail) is not None
+            else:
+                is_stored = thumbnail.key in stored
+            if is_stored:
+                found[variant] = thumbnail
+        return found
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CUSTOM_SETTINGS['THUMBNAIL_WORKERS'],
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def shutdown(wait=True):
+    """Stops the pool, by default once the queued thumbnails are made"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def get_options(geometry, image_format=DEFAULT_FORMAT):
+    return {**GEOMETRIES[geometry], 'format': image_format}
+
+
+def bump_posts(name):
+    """Invalidates cached pages of the posts showing the image"""
+    scopes = [(versions.POSTS, '')]
+    for post in Post.objects.filter(image=name).select_related(
+            'author', 'group'):
+        scopes += [
+            (versions.AUTHOR, post.author.username),
+            (versions.POST, post.pk),
+        ]
+        if post.group is not None:
+            scopes.append((versions.GROUP, post.group.slug))
+    versions.bump(*scopes)
+
+
+def generate(name, geometry, image_format=DEFAULT_FORMAT):
+    """Creates one thumbnail, the worker owns its database connections"""
+    try:
+        image = ImageFile(name, post_images)
+        default.backend.get_thumbnail(
+            image, geometry, **get_options(geometry, image_format))
+        if len(get_stored_variants(image)) == len(VARIANTS):
+            bump_posts(name)
+    except Exception:
+        logger.exception(
+            'Thumbnail %s %s of %s failed', geometry, image_format, name)
+    finally:
+        with _lock:
+            _queued.discard((name, geometry, image_format))
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def enqueue(name):
+    """Queues all variants of the image, once per image and variant"""
+    if settings.CUSTOM_SETTINGS['THUMBNAIL_WORKERS'] is None:
+        return
+    for geometry, image_format in VARIANTS:
+        job = (name, geometry, image_format)
+        with _lock:
+            if job in _queued:
+                continue
+            _queued.add(job)
+        if settings.CUSTOM_SETTINGS['THUMBNAIL_WORKERS']:
+            _get_executor().submit(generate, *job)
+        else:
+            generate(*job)
+
+
+def enqueue_on_commit(name):
+    transaction.on_commit(lambda: enqueue(name))
+
+
+def get_stored_variants(image):
+    """Stored thumbnails of the image keyed by (geometry, format)"""
+    return default.backend.get_cached_thumbnails(image, {
+        variant: (variant[0], get_options(*variant)) for variant in VARIANTS
+    })
+
+
+def prefetch_variants(images):
+    """Reads the stored variants of many images with one query.
+
+    Listings would otherwise hit the sorl database once per image while
+    its cache is cold. Other key value stores are left alone.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return
+    keys = {
+        add_prefix(ImageFile(image).key, identity='thumbnails')
+        for image in images if image
+    }
+    missing = keys - set(kvstore.cache.get_many(keys)) if keys else ()
+    if not missing:
+        return
+    values = dict(
+        KVStoreModel.objects.filter(key__in=missing)
+        .values_list('key', 'value')
+    )
+    kvstore.cache.set_many(
+        {
+            key: values.get(key, cached_db_kvstore.EMPTY_VALUE)
+            for key in missing
+        },
+        thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+    )
+
+
+def get_recorded(names):
+    """Thumbnail file names the key value store has a record of"""
+    files = {ImageFile(name, default.storage): name for name in names}
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {name for file, name in files.items() if kvstore.get(file)}
+    keys = {add_prefix(file.key): name for file, name in files.items()}
+    return {
+        keys[key] for key in
+        KVStoreModel.objects.filter(key__in=keys)
+        .values_list('key', flat=True)
+    }
+
+
+def get_picture(image):
+    """Sources and fallback <img> of a <picture> showing the image.
+
+    Every stored variant goes into the srcset of its format, the JPEG
+    ones into the <img>. The original is shown while variants are made.
+    """
+    if not image:
+        return None
+    found = get_stored_variants(image)
+    if len(found) < len(VARIANTS):
+        enqueue_on_commit(image.name)
+    srcsets = {}
+    for (geometry, image_format), thumbnail in found.items():
+        width = geometry.split('x')[0]
+        srcsets.setdefault(image_format, []).append(
+            f'{thumbnail.url} {width}w')
+    fallback = found.get((DEFAULT_GEOMETRY, DEFAULT_FORMAT))
+    return {
+        'sources': [
+            {'type': MIME_TYPES[image_format],
+             'srcset': ', '.join(srcsets[image_format])}
+            for image_format in VARIANT_FORMATS
+            if image_format != DEFAULT_FORMAT and image_format in srcsets
+        ],
+        'src': fallback.url if fallback else image.url,
+        'srcset': ', '.join(srcsets.get(DEFAULT_FORMAT, ())),
+        'sizes': SIZES,
+    }
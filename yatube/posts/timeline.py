@@ -0,0 +1,275 @@
+"""Hybrid follow feed.
+
+Posts of ordinary authors are pushed into follower timelines on write.
+Authors with at least FEED_PUSH_MAX_FOLLOWERS followers are too
+expensive to fan out, so their posts are pulled at read time instead.
+An author whose followers drop below the threshold gets all his posts
+pushed again, so nothing from the pulled period is lost.
+"""
+from heapq import merge
+from itertools import groupby, islice
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def push_threshold():
+    return settings.CUSTOM_SETTINGS['FEED_PUSH_MAX_FOLLOWERS']
+
+
+def pulled_authors_key(threshold):
+    return f'feed:pulled_authors:{threshold}'
+
+
+def pulled_authors(threshold=None):
+    """Ids of authors whose posts are read on pull.
+
+    Counting followers scans the whole Follow table, so the result is
+    shared between requests for FEED_PULL_CACHE_TIMEOUT seconds.
+    """
+    threshold = threshold or push_threshold()
+    return cache.get_or_set(
+        pulled_authors_key(threshold),
+        lambda: frozenset(Follow.objects.values('author_id').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gte=threshold
+        ).values_list('author_id', flat=True)),
+        settings.CUSTOM_SETTINGS['FEED_PULL_CACHE_TIMEOUT'],
+    )
+
+
+def is_pulled(author_id, threshold=None):
+    """True if author has too many followers to push his posts"""
+    return author_id in pulled_authors(threshold)
+
+
+def _insert(entries, batch_size=BATCH_SIZE):
+    entries = iter(entries)
+    batch = list(islice(entries, batch_size))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, batch_size))
+
+
+def _insert_select(follows):
+    """Entries selected from Follow rows joined to posts, in one query.
+
+    The number of queries does not grow with followers or posts, and
+    entries which already exist are skipped.
+    """
+    select, params = follows.values_list(
+        'user_id', 'author__posts__id', 'author_id', 'author__posts__pub_date'
+    ).order_by().query.sql_with_params()
+    ops = connection.ops
+    meta = TimelineEntry._meta
+    columns = ', '.join(
+        ops.quote_name(meta.get_field(name).column)
+        for name in ('user', 'post', 'author', 'pub_date')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{ops.quote_name(meta.db_table)} ({columns}) {select} '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params
+        )
+
+
+def push_post(post, threshold=None):
+    """Delivers new post into timelines of all author followers"""
+    if is_pulled(post.author_id, threshold):
+        return
+    _insert_select(Follow.objects.filter(
+        author_id=post.author_id, author__posts__id=post.id))
+
+
+def backfill(user_id, author_id):
+    """Copies already published author posts into user timeline"""
+    _insert_select(Follow.objects.filter(
+        user_id=user_id, author_id=author_id, author__posts__isnull=False))
+
+
+def push_author(author_id):
+    """Copies all author posts into timelines of all his followers.
+
+    Follow rows of a deleted author are gone before the deletion signals
+    are sent, so nothing is selected for him.
+    """
+    _insert_select(Follow.objects.filter(
+        author_id=author_id, author__posts__isnull=False))
+
+
+def followers_count(author_id):
+    """Followers from the stats row, never creating it.
+
+    Stats are read while the author may be deleted, a created row would
+    refer to a removed user.
+    """
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    if followers is None:
+        return Follow.objects.filter(author_id=author_id).count()
+    return followers
+
+
+def refresh_mode(author_id, threshold=None):
+    """Forgets cached pulled authors once the author crossed threshold.
+
+    Returns True if the author has just switched between push and pull.
+    """
+    threshold = threshold or push_threshold()
+    followers = followers_count(author_id)
+    if (followers >= threshold) == is_pulled(author_id, threshold):
+        return False
+    cache.delete(pulled_authors_key(threshold))
+    return True
+
+
+def follow(user_id, author_id, threshold=None):
+    # pushed entries of a newly pulled author are left out by feed()
+    refresh_mode(author_id, threshold)
+    if not is_pulled(author_id, threshold):
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Removes author posts from user timeline"""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def unfollow(user_id, author_id, threshold=None):
+    prune(user_id, author_id)
+    if (refresh_mode(author_id, threshold)
+            and not is_pulled(author_id, threshold)):
+        push_author(author_id)
+
+
+def rebuild(user_ids=None, threshold=None):
+    """Recreates timelines from Follow rows, for everybody by default"""
+    follows = Follow.objects.order_by('user_id', 'author_id')
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    pulled = pulled_authors(threshold)
+    rebuilt = 0
+    for user_id, rows in groupby(
+            follows.values_list('user_id', 'author_id').iterator(),
+            key=itemgetter(0)):
+        authors = [author_id for _, author_id in rows]
+        posts = Post.objects.filter(author_id__in=[
+            author_id for author_id in authors if author_id not in pulled
+        ]).values_list('id', 'author_id', 'pub_date')
+        _insert(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts.iterator()
+        )
+        rebuilt += len(authors)
+    return rebuilt
+
+
+class MergedFeed:
+    """Keyset-ordered querysets merged in Python.
+
+    Every part is read by its own index range scan with a LIMIT, so the
+    database never sorts their union. Methods used by the paginators
+    are applied to every part.
+    """
+    ordered = True
+
+    def __init__(self, querysets, ordering=('-feed_date', '-feed_id')):
+        if len({field.startswith('-') for field in ordering}) != 1:
+            raise ValueError('Parts are merged in one direction only')
+        self.ordering = tuple(ordering)
+        self.key = attrgetter(*(field.lstrip('-') for field in ordering))
+        self.querysets = [
+            queryset.order_by(*self.ordering) for queryset in querysets]
+
+    def _clone(self, method, *args, **kwargs):
+        return MergedFeed(
+            (getattr(queryset, method)(*args, **kwargs)
+             for queryset in self.querysets),
+            self.ordering,
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._clone('select_related', *fields)
+
+    def order_by(self, *fields):
+        return MergedFeed(self.querysets, fields)
+
+    @property
+    def query(self):
+        """SQL of all parts, as a cache key of counts"""
+        return ' UNION ALL '.join(
+            str(queryset.query) for queryset in self.querysets)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if key.step is not None or (key.start or 0) < 0 or (
+                key.stop is not None and key.stop < 0):
+            raise ValueError('Only positive slices without step are merged')
+        parts = self.querysets
+        if key.stop is not None:
+            parts = [queryset[:key.stop] for queryset in parts]
+        return list(islice(
+            merge(
+                *parts,
+                key=self.key,
+                reverse=self.ordering[0].startswith('-'),
+            ),
+            key.start,
+            key.stop,
+        ))
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def feed(user_id, threshold=None):
+    """Posts for the follow page, ordered by feed_date and feed_id.
+
+    Without pulled authors it is a single range scan over the user
+    timeline. Otherwise pushed entries and posts of every followed
+    pulled author are separate range scans merged by MergedFeed.
+    """
+    pulled = pulled_authors(threshold)
+    if pulled:
+        pulled = list(Follow.objects.filter(
+            user_id=user_id, author_id__in=pulled
+        ).values_list('author_id', flat=True))
+    pushed = Post.objects.filter(timeline__user_id=user_id).annotate(
+        feed_date=F('timeline__pub_date'),
+        feed_id=F('timeline__post_id'),
+    )
+    if not pulled:
+        return pushed
+    # entries pushed before the author was pulled are read from posts
+    return MergedFeed([pushed.exclude(author_id__in=pulled)] + [
+        Post.objects.filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'),
+            feed_id=F('id'),
+        )
+        for author_id in pulled
+    ])
@@ -0,0 +1,77 @@
+"""Upload handler streaming post images to disk within hard limits"""
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+# head of the file searched for the image header
+HEADER_BYTES = 256 * 1024
+
+
+def read_pixels(head):
+    """Pixel count from the image header, None while it is incomplete"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(BytesIO(head)) as image:
+                return image.width * image.height
+    except Image.DecompressionBombError:
+        return float('inf')
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Streams uploads to a temporary file and refuses oversized images.
+
+    Size is checked on every chunk and pixel count is read from the
+    header before anything decodes the image. A refused file stops the
+    upload without reading the rest of the request, the reason is kept
+    in errors by field name for the form.
+    """
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.errors = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.head = b''
+        if self.content_length is not None:
+            self.check_size(self.content_length)
+
+    def reject(self, error):
+        self.errors[self.field_name] = error
+        self.file.close()
+        raise StopUpload(connection_reset=True)
+
+    def check_size(self, size):
+        max_bytes = settings.CUSTOM_SETTINGS['IMAGE_UPLOAD_MAX_BYTES']
+        if size > max_bytes:
+            self.reject(
+                f'The file is too big, the limit is '
+                f'{filesizeformat(max_bytes)}.'
+            )
+
+    def check_pixels(self, raw_data):
+        self.head += raw_data
+        pixels = read_pixels(self.head)
+        if pixels is None and len(self.head) < HEADER_BYTES:
+            return
+        # unreadable headers are left to the form validation
+        self.head = None
+        max_pixels = settings.CUSTOM_SETTINGS['IMAGE_MAX_PIXELS']
+        if pixels is not None and pixels > max_pixels:
+            self.reject(
+                f'The image is too large, the limit is '
+                f'{max_pixels / 10 ** 6:g} megapixels.'
+            )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.check_size(start + len(raw_data))
+        if self.head is not None:
+            self.check_pixels(raw_data)
+        return super().receive_data_chunk(raw_data, start)
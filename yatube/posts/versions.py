@@ -0,0 +1,53 @@
+"""Generational cache versions bumped on writes.
+
+Every namespace (all posts, one group, one author, one post, the
+follows of one user) has its own version. Cached fragments put the
+versions of everything they show into their keys, so a bump makes old
+entries unreachable and the entries can live for a long TTL. That
+holds only when the cache is shared by all workers, see SHARED_CACHE
+in settings.
+"""
+import time
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+POSTS = 'posts'
+GROUP = 'group'
+AUTHOR = 'author'
+POST = 'post'
+FEED = 'feed'
+
+
+def _key(namespace, key=''):
+    return f'version:{namespace}:{quote(str(key))}'
+
+
+def _initial():
+    # evicted version must never come back to a value used before
+    return int(time.time() * 1000)
+
+
+def get_version(namespace=POSTS, key=''):
+    return get_versions((namespace, key))
+
+
+def get_versions(*scopes):
+    """Dotted versions of (namespace, key) scopes, fetched at once"""
+    keys = [_key(*scope) for scope in scopes]
+    stored = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in stored}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+        stored[key] = version
+    return '.'.join(str(stored[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Invalidates everything cached under the (namespace, key) scopes"""
+    for scope in set(scopes):
+        try:
+            cache.incr(_key(*scope))
+        except ValueError:
+            cache.set(_key(*scope), _initial(), None)
@@ -4,39 +4,45 @@ from django.shortcuts import get_object_or_404, redirect
 from django.views.generic import ListView, View
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
+from django.utils.functional import cached_property
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import UpdateView
 
 from .models import Follow, Group, Post, User
+from . import counters, identity, timeline, versions
 from .forms import CommentForm, PostForm
+from .mixins import (
+    CursorPaginationMixin, ImageUploadMixin, VersionedCacheMixin)
 
 
 posts_per_page = settings.CUSTOM_SETTINGS['POSTS_PER_PAGE']
 
 
-class IndexView(ListView):
+class IndexView(VersionedCacheMixin, CursorPaginationMixin, ListView):
     """Shows main page of the project"""
     paginate_by = posts_per_page
     template_name = 'posts/index.html'
 
     def get_queryset(self):
-        post = Post.objects.select_related('group').all()
+        post = Post.objects.select_related('author', 'group').all()
         return post
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['my_timeout'] = 5
-        return context
-
 
-class GroupPostsView(ListView):
+class GroupPostsView(VersionedCacheMixin, CursorPaginationMixin, ListView):
     """Shows page filtered according to the post group"""
     paginate_by = posts_per_page
     template_name = 'posts/group_list.html'
 
     def get_queryset(self):
-        self.group = get_object_or_404(Group, slug=self.kwargs['slug'])
-        return self.group.posts.all()
+        self.group = identity.get_object(
+            self.request, Group.objects, slug=self.kwargs['slug'])
+        return self.group.posts.select_related('author', 'group')
+
+    def get_count_estimate(self):
+        return self.group.posts_count
+
+    def get_cache_scopes(self, context):
+        return [(versions.GROUP, self.group.slug)]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -44,44 +50,75 @@ class GroupPostsView(ListView):
         return context
 
 
-class ProfileView(ListView):
+class ProfileView(VersionedCacheMixin, CursorPaginationMixin, ListView):
     """Shows author profile page with his posts"""
     paginate_by = posts_per_page
     template_name = 'posts/profile.html'
 
     def get_queryset(self):
-        self.author = get_object_or_404(User, username=self.kwargs['username'])
-        return self.author.posts.all()
+        self.author = identity.get_object(
+            self.request, User.objects, username=self.kwargs['username'])
+        return self.author.posts.select_related('author', 'group')
+
+    @cached_property
+    def stats(self):
+        return counters.user_stats(self.author.id)
+
+    def get_count_estimate(self):
+        return self.stats.posts_count
+
+    def get_cache_scopes(self, context):
+        # posts link to their groups, which may be renamed
+        slugs = sorted({
+            post.group.slug for post in context['page_obj']
+            if post.group is not None
+        })
+        return [(versions.AUTHOR, self.author.username)] + [
+            (versions.GROUP, slug) for slug in slugs]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['author'] = self.author
-        context['post_count'] = self.author.posts.all().count()
-        context['followers'] = self.author.following.all().count()
+        context['post_count'] = self.stats.posts_count
+        context['followers'] = self.stats.followers_count
         context['following'] = self.author.following.filter(
             user=self.request.user.id
         ).exists()
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(VersionedCacheMixin, DetailView):
     """Shows only selected post"""
     template_name = 'posts/post_detail.html'
     model = Post
 
     def get_object(self):
-        return get_object_or_404(Post, id=self.kwargs['post_id'])
+        return identity.get_object(
+            self.request,
+            Post.objects.select_related('author', 'group'),
+            pk=self.kwargs['post_id']
+        )
+
+    def get_cache_scopes(self, context):
+        scopes = [
+            (versions.POST, self.object.id),
+            (versions.AUTHOR, self.object.author.username),
+        ]
+        if self.object.group is not None:
+            scopes.append((versions.GROUP, self.object.group.slug))
+        return scopes
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
-        context['post_count'] = Post.objects.filter(author=post.author).count()
-        context['comments'] = post.comments.all()
+        post = self.object
+        context['post_count'] = counters.user_stats(
+            post.author_id).posts_count
+        context['comments'] = post.comments.select_related('author')
         context['form'] = CommentForm(self.request.POST or None)
         return context
 
 
-class PostCreateView(LoginRequiredMixin, CreateView):
+class PostCreateView(ImageUploadMixin, LoginRequiredMixin, CreateView):
     """Creation of new post"""
     template_name = 'posts/create_post.html'
     model = Post
@@ -99,14 +136,18 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class PostEditView(LoginRequiredMixin, UpdateView):
+class PostEditView(ImageUploadMixin, LoginRequiredMixin, UpdateView):
     """Edition of selected post"""
     template_name = 'posts/create_post.html'
     model = Post
     form_class = PostForm
 
     def get_object(self):
-        return get_object_or_404(Post, id=self.kwargs['post_id'])
+        return identity.get_object(
+            self.request,
+            Post.objects.select_related('author'),
+            pk=self.kwargs['post_id']
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -137,7 +178,8 @@ class AddCommentView(LoginRequiredMixin, CreateView):
     template_name = 'includes/comment.html'
 
     def post(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
+        post = identity.get_object(
+            request, Post.objects, pk=self.kwargs['post_id'])
         form = CommentForm(request.POST or None)
         comment = form.save(commit=False)
         comment.author = self.request.user
@@ -146,21 +188,31 @@ class AddCommentView(LoginRequiredMixin, CreateView):
         return redirect('posts:post_detail', post_id=post.id)
 
 
-class FollowIndexView(LoginRequiredMixin, ListView):
+class FollowIndexView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Shows page with posts of authors which you subscribed"""
     paginate_by = posts_per_page
     template_name = 'posts/follow.html'
 
+    cursor_keys = ('feed_date', 'feed_id')
+
+    def get_count_scopes(self):
+        # follows change the feed without touching any post
+        return (
+            (versions.POSTS, ''),
+            (versions.FEED, self.request.user.id),
+        )
+
     def get_queryset(self):
-        return Post.objects.select_related(
-            'author'
-        ).filter(author__following__user=self.request.user)
+        return timeline.feed(self.request.user.id).select_related(
+            'author', 'group'
+        )
 
 
 class ProfileFollowView(LoginRequiredMixin, View):
     """Subscribing for author"""
     def get(self, request, **kwargs):
-        user = get_object_or_404(User, username=self.kwargs['username'])
+        user = identity.get_object(
+            request, User.objects, username=self.kwargs['username'])
         if user == self.request.user:
             return redirect('posts:profile', username=self.kwargs['username'])
         Follow.objects.get_or_create(user=self.request.user, author=user)
@@ -170,6 +222,7 @@ class ProfileFollowView(LoginRequiredMixin, View):
 class ProfileUnfollowView(LoginRequiredMixin, View):
     """Unsubscribing for author"""
     def get(self, request, **kwargs):
-        user = get_object_or_404(User, username=self.kwargs['username'])
+        user = identity.get_object(
+            request, User.objects, username=self.kwargs['username'])
         get_object_or_404(Follow, user=self.request.user, author=user).delete()
         return redirect('posts:profile', username=self.kwargs['username'])
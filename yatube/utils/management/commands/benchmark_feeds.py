@@ -0,0 +1,129 @@
+import random
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+posts_per_page = settings.CUSTOM_SETTINGS['POSTS_PER_PAGE']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """Follow feed strategies benchmark"""
+    help = (
+        'Compares pure-join, pure-push and hybrid follow feeds on a '
+        'synthetic follow graph. All data is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--celebrities', type=int, default=5)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Regular authors followed by each user')
+        parser.add_argument('--posts', type=int, default=10,
+                            help='Posts written by each author')
+        parser.add_argument('--threshold', type=int, default=500,
+                            help='Follower threshold for the hybrid feed')
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.thresholds = []
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # pulled authors were counted on the rolled back graph
+            cache.delete_many([
+                timeline.pulled_authors_key(threshold)
+                for threshold in self.thresholds
+            ])
+
+    def build_graph(self, options):
+        """Celebrities are followed by everybody, others at random"""
+        User.objects.bulk_create(
+            User(username=f'feed_bench_{number}')
+            for number in range(options['users'])
+        )
+        users = list(User.objects.filter(
+            username__startswith='feed_bench_').order_by('id'))
+        celebrities = users[:options['celebrities']]
+        regular = users[options['celebrities']:]
+        follows = []
+        for user in users:
+            authors = set(random.sample(regular, options['follows']))
+            authors.update(celebrities)
+            authors.discard(user)
+            follows.extend(Follow(user=user, author=author)
+                           for author in authors)
+        Follow.objects.bulk_create(follows, batch_size=timeline.BATCH_SIZE)
+        Post.objects.bulk_create(
+            (Post(author=author, text='Synthetic post')
+             for author in users for _ in range(options['posts'])),
+            batch_size=timeline.BATCH_SIZE,
+        )
+        return users
+
+    def measure_reads(self, readers, make_queryset):
+        started = perf_counter()
+        for reader in readers:
+            list(make_queryset(reader.id)[:posts_per_page])
+        return (perf_counter() - started) / len(readers) * 1000
+
+    def measure_push(self, threshold):
+        started = perf_counter()
+        timeline.rebuild(threshold=threshold)
+        return perf_counter() - started
+
+    def report(self, name, fan_out, rows, read_ms):
+        self.stdout.write(
+            f'{name:<10} fan-out {fan_out:8.2f} s  '
+            f'timeline rows {rows:>9}  read {read_ms:7.2f} ms/page\n'
+        )
+
+    def run(self, options):
+        users = self.build_graph(options)
+        readers = random.sample(users, min(options['reads'], len(users)))
+        entries = TimelineEntry.objects
+
+        read_ms = self.measure_reads(
+            readers,
+            lambda user_id: Post.objects.filter(
+                author__following__user_id=user_id
+            ).order_by('-pub_date', '-id'),
+        )
+        self.report('pure-join', 0, 0, read_ms)
+
+        everybody = len(users) + 1
+        self.thresholds = [everybody, options['threshold']]
+        seconds = self.measure_push(everybody)
+        read_ms = self.measure_reads(
+            readers,
+            lambda user_id: timeline.feed(user_id, everybody).order_by(
+                '-feed_date', '-feed_id'),
+        )
+        self.report('pure-push', seconds, entries.count(), read_ms)
+
+        threshold = options['threshold']
+        seconds = self.measure_push(threshold)
+        read_ms = self.measure_reads(
+            readers,
+            lambda user_id: timeline.feed(user_id, threshold).order_by(
+                '-feed_date', '-feed_id'),
+        )
+        self.report('hybrid', seconds, entries.count(), read_ms)
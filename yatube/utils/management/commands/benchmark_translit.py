@@ -0,0 +1,144 @@
+import json
+import platform
+import random
+import tracemalloc
+from functools import partial
+from timeit import repeat
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.context_processors.pytils import legacy, translit
+from core.context_processors.pytils.corpora import SAMPLE, random_texts
+
+FUNCTIONS = ('translify', 'detranslify', 'slugify')
+IMPLEMENTATIONS = (('current', translit), ('reference', legacy))
+
+
+def make_corpora(titles, post_size, seed):
+    """Short titles, long posts and mixed Cyrillic/Latin texts"""
+    generator = random.Random(seed)
+    words = SAMPLE.split()
+    return {
+        'titles': [
+            u' '.join(generator.sample(words, generator.randint(1, 4)))
+            for _ in range(titles)
+        ],
+        'posts': [
+            u' '.join(generator.choices(words, k=post_size // 2))[:post_size]
+            for _ in range(10)
+        ],
+        'mixed': random_texts(count=100, length=200, seed=seed),
+    }
+
+
+class Command(BaseCommand):
+    """Transliteration benchmark suite"""
+    help = (
+        'Times translify, detranslify and slugify on titles, posts and '
+        'mixed texts, and measures their allocations. Results may be '
+        'saved as JSON and compared with an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000,
+                            help='Texts in the titles corpus')
+        parser.add_argument('--post-size', type=int, default=10240,
+                            help='Symbols in each text of the posts corpus')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='JSON file to save the results in')
+        parser.add_argument('--baseline',
+                            help='JSON file of an earlier run to compare')
+
+    def measure(self, function, texts, options):
+        """Best calls per second over the corpus"""
+        seconds = min(repeat(
+            lambda: [function(text) for text in texts],
+            number=1,
+            repeat=options['repeat'],
+        ))
+        return len(texts) / seconds
+
+    def measure_memory(self, function, texts):
+        """Peak of memory traced during one call, the largest over texts"""
+        peak = 0
+        for text in texts:
+            # tracing restarts for each call, as the peak can not be reset
+            # before python 3.9
+            tracemalloc.start()
+            try:
+                function(text)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        return peak
+
+    def load_baseline(self, path):
+        """Corpora sizes and ops/sec by function, corpus, implementation"""
+        if path is None:
+            return {}, {}
+        try:
+            with open(path) as baseline:
+                data = json.load(baseline)
+            return data['corpora'], {
+                (result['function'], result['corpus'],
+                 result['implementation']): result['ops_per_sec']
+                for result in data['results']
+            }
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            raise CommandError(f'Bad baseline {path}: {error}')
+
+    def handle(self, *args, **options):
+        baseline_corpora, baseline = self.load_baseline(options['baseline'])
+        corpora = make_corpora(
+            options['titles'], options['post_size'], options['seed'])
+        sizes = {
+            corpus: {'texts': len(texts), 'symbols': sum(map(len, texts))}
+            for corpus, texts in corpora.items()
+        }
+        if baseline and baseline_corpora != sizes:
+            self.stderr.write('Baseline was run on other corpora\n')
+        # detranslify runs on the latin side of each corpus
+        latin = {
+            name: [translit.translify(text, strict=False) for text in texts]
+            for name, texts in corpora.items()
+        }
+        results = []
+        for name in FUNCTIONS:
+            for corpus, texts in corpora.items():
+                if name == 'detranslify':
+                    texts = latin[corpus]
+                for implementation, module in IMPLEMENTATIONS:
+                    function = getattr(module, name)
+                    # cache hits would hide the transliteration itself
+                    function = getattr(function, '__wrapped__', function)
+                    if name == 'translify':
+                        # posts have symbols out of the table
+                        function = partial(function, strict=False)
+                    result = {
+                        'function': name,
+                        'corpus': corpus,
+                        'implementation': implementation,
+                        'ops_per_sec': self.measure(function, texts, options),
+                        'peak_bytes': self.measure_memory(function, texts),
+                    }
+                    results.append(result)
+                    self.report(result, baseline.get(
+                        (name, corpus, implementation)))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'python': platform.python_version(),
+                    'corpora': sizes,
+                    'results': results,
+                }, output, indent=2)
+
+    def report(self, result, before):
+        change = f'  x{result["ops_per_sec"] / before:.2f}' if before else ''
+        self.stdout.write(
+            f'{result["function"]:<12} {result["corpus"]:<7} '
+            f'{result["implementation"]:<10} '
+            f'{result["ops_per_sec"]:12.0f} ops/s  '
+            f'peak {result["peak_bytes"]:>9} B{change}\n'
+        )
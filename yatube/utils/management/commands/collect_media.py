@@ -0,0 +1,178 @@
+import os
+from functools import partial
+from itertools import islice
+from time import monotonic, sleep, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts import storage, thumbnails
+from posts.models import Post
+
+
+def iter_files(root, directory):
+    """Relative names of the files under directory in code point order.
+
+    Directories sort as their name with a slash, which is how their
+    files sort among the names of their siblings.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(root, directory)))
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.name + (
+        '/' if entry.is_dir(follow_symlinks=False) else ''))
+    for entry in entries:
+        name = f'{directory}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_files(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            yield name
+
+
+def iter_images(batch_size):
+    """Distinct Post.image names in code point order, read by keyset"""
+    last = ''
+    while True:
+        batch = list(
+            Post.objects.filter(image__gt=last)
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()[:batch_size]
+        )
+        if not batch:
+            return
+        for name in batch:
+            # a merge with an out of order stream would delete used files
+            if name <= last:
+                raise CommandError(
+                    'The database does not sort image names by code point, '
+                    'the image column needs a binary collation'
+                )
+            last = name
+            yield name
+
+
+def iter_orphans(files, names):
+    """Files missing from names, both streams sorted"""
+    name = next(names, None)
+    for file in files:
+        while name is not None and name < file:
+            name = next(names, None)
+        if name != file:
+            yield file
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Orphaned media garbage collection command"""
+    help = (
+        'Deletes post images no post refers to, with their thumbnails, '
+        'and thumbnails unknown to the key value store. Files and names '
+        'are streamed in sorted batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list what would be deleted',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=50,
+            help='Deleted files per second, 0 for no limit',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Keep files modified during the last seconds',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Names read per query',
+        )
+
+    def is_old(self, name):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            return os.stat(path).st_mtime <= self.deadline
+        except FileNotFoundError:
+            return False
+
+    def throttle(self):
+        if self.rate:
+            wait = self.next_delete - monotonic()
+            if wait > 0:
+                sleep(wait)
+            self.next_delete = max(self.next_delete, monotonic()) + (
+                1 / self.rate)
+
+    def get_orphaned_images(self, batch_size):
+        # files are saved before the post row is committed
+        upload_to = Post._meta.get_field('image').upload_to.strip('/')
+        orphans = iter_orphans(
+            iter_files(settings.MEDIA_ROOT, upload_to),
+            iter_images(batch_size)
+        )
+        return (name for name in orphans if self.is_old(name))
+
+    def get_stale_thumbnails(self, batch_size):
+        prefix = thumbnail_settings.THUMBNAIL_PREFIX.strip('/')
+        files = iter_files(settings.MEDIA_ROOT, prefix)
+        for batch in batched(files, batch_size):
+            recorded = thumbnails.get_recorded(batch)
+            yield from (
+                name for name in batch
+                if name not in recorded and self.is_old(name)
+            )
+
+    def delete_thumbnail(self, name):
+        default.storage.delete(name)
+        return True
+
+    def collect(self, names, delete, dry_run):
+        count = 0
+        for name in names:
+            if dry_run:
+                self.stdout.write(f'Would delete {name}\n')
+                count += 1
+                continue
+            self.throttle()
+            if delete(name):
+                count += 1
+        return count
+
+    def handle(self, *args, **options):
+        self.rate = options['rate']
+        self.next_delete = monotonic()
+        self.deadline = time() - options['min_age']
+        dry_run = options['dry_run']
+        images = self.collect(
+            self.get_orphaned_images(options['batch_size']),
+            partial(storage.delete_unused, grace=options['min_age']),
+            dry_run
+        )
+        # orphaned images took their recorded thumbnails with them
+        stale = self.collect(
+            self.get_stale_thumbnails(options['batch_size']),
+            self.delete_thumbnail,
+            dry_run
+        )
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(
+            f'{verb} {images} orphaned images and {stale} stale thumbnails\n')
@@ -0,0 +1,91 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts import timeline, views
+from posts.models import Follow, Post
+from posts.paginators import NEXT, CursorPaginator
+
+# plan lines that mean every row of the table is read or sorted
+BAD_PLANS = {
+    'sqlite': re.compile(
+        r'\bSCAN (TABLE )?\w+(?! USING (COVERING )?INDEX)(\s|$)'
+        r'|USE TEMP B-TREE'
+    ),
+    'postgresql': re.compile(r'Seq Scan|\bSort\b'),
+}
+
+
+class Command(BaseCommand):
+    """EXPLAIN audit of the listing queries"""
+    help = 'Fails if a view query falls back to a full scan or a sort'
+
+    def get_view_queryset(self, view_class, user, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view.get_queryset().order_by(
+            *('-' + key for key in view.cursor_keys)), view
+
+    def get_querysets(self, post, follow):
+        """Queries run by the views on their first and next pages"""
+        listings = {
+            'posts:index': (views.IndexView, AnonymousUser(), {}),
+            'posts:group_list': (
+                views.GroupPostsView, AnonymousUser(),
+                {'slug': post.group.slug}),
+            'posts:profile': (
+                views.ProfileView, AnonymousUser(),
+                {'username': post.author.username}),
+            'posts:follow_index': (views.FollowIndexView, follow.user, {}),
+        }
+        querysets = {}
+        for name, (view_class, user, kwargs) in listings.items():
+            queryset, view = self.get_view_queryset(
+                view_class, user, **kwargs)
+            paginator = CursorPaginator(
+                queryset, view.paginate_by, keys=view.cursor_keys)
+            querysets[name] = paginator.get_keyset_queryset(
+                NEXT, None, None)
+            querysets[f'{name} next page'] = paginator.get_keyset_queryset(
+                NEXT, timezone.now(), post.id)
+        # pushed and pulled posts are merged in python, part by part
+        pulled = timeline.feed(follow.user_id, threshold=1)
+        for number, queryset in enumerate(pulled.querysets):
+            querysets[f'posts:follow_index pulled part {number}'] = queryset[
+                :views.posts_per_page + 1]
+        querysets['posts:post_detail comments'] = post.comments.select_related(
+            'author')
+        querysets['followers of author'] = Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id', flat=True)
+        querysets['is following'] = Follow.objects.filter(
+            author_id=follow.author_id, user_id=follow.user_id)
+        return querysets
+
+    def handle(self, *args, **options):
+        bad_plan = BAD_PLANS.get(connection.vendor)
+        if bad_plan is None:
+            raise CommandError(f'Plans of {connection.vendor} are not known')
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        follow = Follow.objects.select_related('user').first()
+        if post is None or follow is None:
+            raise CommandError(
+                'Nothing to explain, add a post in a group and a follow')
+        failed = []
+        for name, queryset in self.get_querysets(post, follow).items():
+            plan = queryset.explain()
+            bad = [line for line in plan.splitlines() if bad_plan.search(line)]
+            self.stdout.write(f'{name}: {"FAIL" if bad else "ok"}\n')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}\n')
+            if bad:
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Full scan or sort in: {}'.format(', '.join(failed)))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Follow timelines rebuilding command"""
+    help = 'Rebuilds materialized follow timelines from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Rebuild only timelines of these users',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('id', flat=True))
+        with transaction.atomic():
+            follows = timeline.rebuild(user_ids)
+        self.stdout.write(f'Rebuilt timelines from {follows} follows\n')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    """Denormalized counters reconciliation command"""
+    help = 'Recounts stored post, follower and comment counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=counters.BATCH_SIZE,
+            help='Rows recounted per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed = {
+            'users': counters.reconcile_users(batch_size),
+            'groups': counters.reconcile_groups(batch_size),
+            'posts': counters.reconcile_posts(batch_size),
+        }
+        for name, count in fixed.items():
+            self.stdout.write(f'Fixed counters of {count} {name}\n')
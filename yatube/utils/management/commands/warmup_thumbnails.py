@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+from datetime import timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import post_images
+
+
+def warm(name):
+    """Makes the missing variants of one image, runs in pool processes"""
+    image = ImageFile(name, post_images)
+    stored = thumbnails.get_stored_variants(image)
+    missing = [
+        variant for variant in thumbnails.VARIANTS if variant not in stored
+    ]
+    for variant in missing:
+        thumbnails.generate(name, *variant)
+    # unreadable sources are only logged by sorl, nothing gets stored
+    stored = thumbnails.get_stored_variants(image) if missing else stored
+    failed = [variant for variant in missing if variant not in stored]
+    return len(missing) - len(failed), failed
+
+
+class Command(BaseCommand):
+    """Thumbnail key value store warmup command"""
+    help = (
+        'Makes every missing thumbnail variant of post images in a pool '
+        'of processes. Posts are read in primary key order, so a stopped '
+        'run is resumed with --after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes, 0 makes thumbnails in this process',
+        )
+        parser.add_argument(
+            '--after',
+            type=int,
+            default=0,
+            help='Skip posts up to this primary key',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Only posts published during the last days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Posts read per query',
+        )
+
+    def get_batches(self, queryset, after, batch_size):
+        """Lists of (pk, image) read by keyset, never the whole table"""
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=after)
+                .order_by('pk')
+                .values_list('pk', 'image')[:batch_size]
+            )
+            if not batch:
+                return
+            yield batch
+            after = batch[-1][0]
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if options['days'] is not None:
+            queryset = queryset.filter(
+                pub_date__gte=timezone.now() - timedelta(
+                    days=options['days']))
+        if options['processes']:
+            # children must not share the connections of the parent
+            connections.close_all()
+            pool = multiprocessing.Pool(options['processes'])
+            run = pool.imap
+        else:
+            pool = None
+            run = map
+        start = perf_counter()
+        warmed = made = 0
+        failures = []
+        last_pk = options['after']
+        batches = self.get_batches(
+            queryset, options['after'], options['batch_size'])
+        try:
+            for batch in batches:
+                # posts sharing a blob share its thumbnails, a blob met
+                # again in a later batch only has its variants looked up
+                names = list(dict.fromkeys(name for pk, name in batch))
+                for name, (count, failed) in zip(names, run(warm, names)):
+                    warmed += 1
+                    made += count
+                    failures.extend((name, variant) for variant in failed)
+                last_pk = batch[-1][0]
+        except KeyboardInterrupt:
+            self.stderr.write(f'Interrupted, resume with --after {last_pk}')
+            raise
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        elapsed = perf_counter() - start
+        rate = warmed / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Warmed {warmed} images, made {made} thumbnails in '
+            f'{elapsed:.1f} s ({rate:.1f} images/s), last post {last_pk}\n'
+        )
+        for name, (geometry, image_format) in failures:
+            self.stderr.write(f'Failed {name} {geometry} {image_format}')
+        if failures:
+            raise CommandError(f'{len(failures)} thumbnails failed')
@@ -56,12 +56,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.IdentityMapMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -151,19 +153,70 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_mails')
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# version bumps reach other workers only through a shared cache, with a
+# per-process one cached pages and counts have to expire on their own
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+VERSIONED_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 5
+
+
 CUSTOM_SETTINGS = {
     'POSTS_PER_PAGE': 10,
+    'FEED_PUSH_MAX_FOLLOWERS': 1000,
+    'FEED_PULL_CACHE_TIMEOUT': 60 * 5 if SHARED_CACHE else 5,
+    'PAGINATOR_COUNT_TIMEOUT': VERSIONED_CACHE_TIMEOUT,
+    'PAGE_CACHE_TIMEOUT': VERSIONED_CACHE_TIMEOUT,
+    # threads making thumbnails, 0 makes them inline and None not at all
+    'THUMBNAIL_WORKERS': 2,
+    # thumbnail lookups kept in memory of each process
+    'THUMBNAIL_LRU_SIZE': 4096,
+    'THUMBNAIL_LRU_TIMEOUT': 60,
+    'IMAGE_MAX_SIZE': (1920, 1920),
+    'IMAGE_QUALITY': 85,
+    'IMAGE_UPLOAD_MAX_BYTES': 10 * 1024 * 1024,
+    'IMAGE_MAX_PIXELS': 40 * 10 ** 6,
+    # blobs written or reused this many seconds ago are not deleted on
+    # release, the post referring to them may be not committed yet
+    'IMAGE_REUSE_GRACE': 60,
+    'MEDIA_MAX_AGE': 60 * 60,
+    # None, 'X-Sendfile' or 'X-Accel-Redirect' to let the proxy send media
+    'MEDIA_SENDFILE': None,
+    'MEDIA_ACCEL_PREFIX': '/protected-media/',
+    # 'raise' rejects requests over budget, the test settings use it
+    'QUERY_BUDGET_MODE': 'log',
+    'QUERY_BUDGETS': {
+        'posts:index': 4,
+        'posts:group_list': 4,
+        'posts:profile': 9,
+        'posts:post_detail': 8,
+        'posts:post_create': 12,
+        'posts:post_edit': 10,
+        'posts:add_comment': 6,
+        'posts:follow_index': 6,
+        'posts:profile_follow': 20,
+        'posts:profile_unfollow': 14,
+    },
 }
 
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.kvstore.LRUKVStore'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# LRU size of each pytils translit filter and function, 0 turns the
+# caching off
+PYTILS_TRANSLIT_CACHE_SIZE = 1024
@@ -0,0 +1,11 @@
+"""Settings of the test runs, on top of the project settings"""
+from .settings import *  # noqa: F401,F403
+from .settings import CUSTOM_SETTINGS
+
+CUSTOM_SETTINGS = {
+    **CUSTOM_SETTINGS,
+    # background writes would outlive the temporary MEDIA_ROOT of tests,
+    # tests which need thumbnails switch the workers on themselves
+    'THUMBNAIL_WORKERS': None,
+    'QUERY_BUDGET_MODE': 'raise',
+}